@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from app.core.auth import get_admin_user
+from app.core.config import settings
+from app.core.profiling import profiler, slow_request_log
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(10, ge=1, le=1000),
+    current_user: dict = Depends(get_admin_user)
+):
+    """Sample this worker's event loop for a window; returns collapsed stacks for flamegraph tools"""
+    if seconds > settings.profile_max_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Profile window is limited to {settings.profile_max_seconds} seconds"
+        )
+    try:
+        return await profiler.profile(seconds, interval_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.get("/slow-requests")
+async def slow_requests(current_user: dict = Depends(get_admin_user)):
+    """Recent requests over SLOW_REQUEST_THRESHOLD_MS with stage timings and query plans"""
+    return {"thresholdMs": settings.slow_request_threshold_ms, "requests": slow_request_log.list()}
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1 import auth, chat, commits
+from app.api.v1 import admin, auth, chat, commits
 
 api_router = APIRouter()
 
@@ -7,3 +7,4 @@ api_router = APIRouter()
 api_router.include_router(auth.router)
 api_router.include_router(chat.router)
 api_router.include_router(commits.router)
+api_router.include_router(admin.router)
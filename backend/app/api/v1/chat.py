@@ -1,40 +1,108 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.responses import ORJSONResponse
 from app.schemas.schemas import ChatRequest, ChatResponse
-from app.core.auth import get_current_user
-from app.services.services import ChatService
-from app.db.database import get_database
+from app.core.auth import get_current_user, get_current_user_database
+from app.core.etag import cache_headers, etag_matches, make_etag, not_modified
+from app.core.idempotency import IdempotencyConflict, abandoned_check, chat_idempotency, fingerprint, scoped_key
+from app.services.routing import model_router
+from app.services.services import ChatService, GenerationCancelled
+from app.services.usage import QuotaExceeded, usage_service
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 chat_service = ChatService()
 
 @router.get("/list")
-async def list_chats(current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_database)):
+async def list_chats(
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_current_user_database),
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match")
+):
+    # Revision is read before the data: a concurrent change can only make the ETag stale, never the body
+    revision = await chat_service.list_revision(current_user["id"], db)
+    etag = make_etag("chats", revision.isoformat()) if revision else None
+    if etag and etag_matches(if_none_match, etag):
+        return not_modified(etag)
     items = await chat_service.list_chats(current_user["id"], db)
-    return {"chats": items}
+    return ORJSONResponse({"chats": items}, headers=cache_headers(etag))
+
+@router.get("/usage")
+async def get_usage(current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_current_user_database)):
+    return await usage_service.get_usage(current_user["id"], db)
 
 @router.post("/new")
-async def new_chat(current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_database)):
-    # Auto-name like Chat One, Chat Two based on count
-    items = await chat_service.list_chats(current_user["id"], db)
-    name = f"Chat {len(items) + 1}"
+async def new_chat(current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_current_user_database)):
+    # Auto-name like Chat 1, Chat 2 from an atomic per-user sequence
+    number = await chat_service.next_chat_number(current_user["id"], db)
+    name = f"Chat {number}"
     created = await chat_service.create_chat(current_user["id"], db, name=name)
     return created
 
 @router.get("/{chat_id}/messages")
-async def get_messages(chat_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_database)):
-    messages = await chat_service.get_chat_messages(chat_id, current_user["id"], db)
-    return {"chatId": chat_id, "messages": messages}
+async def get_messages(
+    chat_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_current_user_database),
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match")
+):
+    revision = await chat_service.messages_revision(chat_id, current_user["id"], db)
+    etag = make_etag(chat_id, revision) if revision is not None else None
+    if etag and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    messages = await chat_service.get_chat_messages(chat_id, current_user["id"], db, revision)
+    # Messages are our own documents: encode them directly instead of through jsonable_encoder
+    return ORJSONResponse({"chatId": chat_id, "messages": messages}, headers=cache_headers(etag))
+
+@router.post("/{chat_id}/cancel")
+async def cancel_generation(chat_id: str, current_user: dict = Depends(get_current_user)):
+    cancelled = await chat_service.cancel_generation(chat_id, current_user["id"])
+    return {"chatId": chat_id, "cancelled": cancelled}
 
 @router.post("", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
+    raw_request: Request,
     current_user: dict = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_current_user_database),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
 ):
+    if request.route is not None and request.route not in model_router.routes():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown model route '{request.route}', expected one of: {', '.join(model_router.routes())}"
+        )
+    key = scoped_key(current_user["id"], "chat", idempotency_key)
+    is_disconnected = raw_request.is_disconnected
+    if key is not None:
+        # A keyed client may retry after a timeout, so give a retry the chance to attach first
+        is_disconnected = abandoned_check(raw_request.is_disconnected, chat_idempotency, key)
+
+    async def run():
+        # Aborts the Ollama stream on explicit cancel, or when the client goes away
+        return await chat_service.process_message_cancellable(
+            chat_id=request.chatId,
+            user_message=request.userMessage,
+            user_id=current_user["id"],
+            db=db,
+            is_disconnected=is_disconnected,
+            route=request.route,
+        )
+
     try:
-        response = await chat_service.process_message(chat_id=request.chatId, user_message=request.userMessage, user_id=current_user["id"], db=db)
-        return response
+        if key is None:
+            return await run()
+        # Retries with the same key replay the original turn instead of generating again
+        return await chat_idempotency.run(key, fingerprint(request.model_dump()), run)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except GenerationCancelled as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except QuotaExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(max(int(e.retry_after + 0.999), 1))}
+        )
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Chat processing failed: {str(e)}")
@@ -1,28 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.schemas.schemas import CommitRequest, CommitResponse, FetchResponse, CommitHistoryResponse
-from app.core.auth import get_current_user
-from app.services.services import CommitService
-from app.db.database import get_database
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from contextlib import aclosing
+from typing import Optional
+import orjson
+from app.schemas.schemas import CommitRequest, CommitResponse, FetchResponse, FanoutRequest, ForkRequest, ForkResponse, CommitHistoryResponse
+from app.core.auth import get_current_user, get_current_user_database
+from app.core.etag import cache_headers, etag_matches, make_etag, not_modified
+from app.core.idempotency import IdempotencyConflict, commit_idempotency, fingerprint, scoped_key
+from app.services.services import ChatService, CommitService
+from app.services.usage import QuotaExceeded, usage_service
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 router = APIRouter(prefix="/commits", tags=["commits"])
 commit_service = CommitService()
+chat_service = ChatService()
 
 @router.post("/commit", response_model=CommitResponse)
 async def commit(
     request: CommitRequest,
     current_user: dict = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_current_user_database),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
 ):
     """Save current chat state as a commit"""
-    try:
-        response = await commit_service.create_commit(
+    async def run():
+        return await commit_service.create_commit(
             chat_id=request.chatId,
             name=request.name,
             user_id=current_user["id"],
             db=db
         )
-        return response
+
+    try:
+        key = scoped_key(current_user["id"], "commit", idempotency_key)
+        if key is None:
+            return await run()
+        return await commit_idempotency.run(key, fingerprint(request.model_dump()), run)
+    except IdempotencyConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -33,7 +51,7 @@ async def commit(
 async def fetch_commit(
     commit_id: str,
     current_user: dict = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_current_user_database)
 ):
     """Restore chat state from a commit"""
     try:
@@ -42,27 +60,94 @@ async def fetch_commit(
             user_id=current_user["id"],
             db=db
         )
-        return response
+        # Skip response_model re-validation of the restored messages
+        return ORJSONResponse(response.model_dump())
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Commit fetch failed: {str(e)}"
         )
 
+@router.post("/fork/{commit_id}", response_model=ForkResponse)
+async def fork_commit(
+    commit_id: str,
+    request: Optional[ForkRequest] = None,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_current_user_database)
+):
+    """Start a new chat from a commit without touching the source chat"""
+    try:
+        response = await commit_service.fork_commit(
+            commit_id=commit_id,
+            user_id=current_user["id"],
+            db=db,
+            name=request.name if request else None
+        )
+        return response
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Commit fork failed: {str(e)}"
+        )
+
+@router.post("/fanout")
+async def fanout(
+    request: FanoutRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_current_user_database)
+):
+    """Ask one question against several commits and/or models at once, without touching any chat.
+    Streams one NDJSON line per generation as it completes."""
+    if not request.commitIds and request.chatId is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give at least one commitId or a chatId")
+    try:
+        targets = await chat_service.prepare_fanout(
+            user_message=request.userMessage,
+            user_id=current_user["id"],
+            db=db,
+            commit_ids=request.commitIds,
+            chat_id=request.chatId,
+            models=request.models
+        )
+        # One rate-limit token per generation, like that many chat turns
+        await usage_service.check(current_user["id"], db, turns=len(targets))
+    except QuotaExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(max(int(e.retry_after + 0.999), 1))}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    async def lines():
+        # Starlette cancels this generator when the client disconnects, which cancels the generations
+        async with aclosing(chat_service.run_fanout(targets, request.userMessage, current_user["id"], db)) as results:
+            async for result in results:
+                yield orjson.dumps(result) + b"\n"
+    
+    # identity encoding keeps GZipMiddleware from buffering the stream
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"Content-Encoding": "identity"})
+
 @router.get("/{chat_id}", response_model=CommitHistoryResponse)
 async def get_commit_history(
     chat_id: str,
     current_user: dict = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_current_user_database),
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match")
 ):
     """Get commit history for a chat"""
     try:
+        revision = await commit_service.history_revision(chat_id, current_user["id"], db)
+        etag = make_etag("history", chat_id, revision) if revision is not None else None
+        if etag and etag_matches(if_none_match, etag):
+            return not_modified(etag)
         response = await commit_service.get_commit_history(
             chat_id=chat_id,
             user_id=current_user["id"],
             db=db
         )
-        return response
+        return ORJSONResponse(response.model_dump(), headers=cache_headers(etag))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
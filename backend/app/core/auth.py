@@ -5,7 +5,8 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.config import settings
-from app.db.database import get_database
+from app.core.profiling import stage
+from app.db.database import get_database, get_user_database
 from app.models.models import User
 
 # Password hashing
@@ -53,7 +54,8 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = await db.users.find_one({"email": email})
+    with stage("auth.user_lookup", db.users, {"email": email}):
+        user = await db.users.find_one({"email": email})
     if user is None:
         raise credentials_exception
     
@@ -62,3 +64,16 @@ async def get_current_user(
         "email": user["email"],
         "name": user["name"]
     }
+
+async def get_current_user_database(current_user: dict = Depends(get_current_user)):
+    """Database holding the current user's chats and commits"""
+    return await get_user_database(current_user["id"])
+
+async def get_admin_user(current_user: dict = Depends(get_current_user)) -> dict:
+    """Require an authenticated user listed in ADMIN_EMAILS"""
+    if current_user["email"].lower() not in settings.normalized_admin_emails():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
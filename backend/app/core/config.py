@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Union
+from typing import List, Tuple, Union
 import os, json
 
 class Settings(BaseSettings):
@@ -8,20 +8,103 @@ class Settings(BaseSettings):
         env_file=".env",
         case_sensitive=False,
         extra="ignore",  # ignore unknown envs (e.g., LANGCHAIN_TRACING_V2)
+        protected_namespaces=("settings_",),  # allow model_* fields
     )
 
     # Database
     mongodb_url: str = "mongodb://localhost:27017"
     database_name: str = "promptpilot"
+    create_indexes_in_background: bool = True  # don't block startup on index builds
+    # MONGODB_URL is a mongos: shard user collections on a hashed userId key
+    mongodb_sharded: bool = False
+    # CSV of name=url deployments holding chats/commits/usage, users spread by userId
+    # (empty keeps everything on MONGODB_URL, which always holds users and shared state)
+    mongodb_shard_urls: str = ""
     
     # Ollama Configuration
     ollama_base_url: str = "http://localhost:11434"
     ollama_model: str = "llama3"
+    # Optional small model for short conversational turns (empty disables routing)
+    ollama_fast_model: str = ""
+    routing_fast_max_chars: int = 280
+    routing_fast_max_history_chars: int = 6000
+    routing_heavy_keywords: str = "refactor,implement,debug,optimize,architecture,design,explain,review,write,fix,error,bug"
+    ollama_timeout_seconds: float = 300.0
+    llm_max_concurrency: int = 2  # concurrent generations per worker
+    fanout_max_targets: int = 8  # context x model generations per fan-out request
+    
+    # In-process LRU of hot chat documents, per worker (0 disables)
+    chat_cache_max_mb: float = 64
+    
+    # Model warm-up: preload routed models and keep them resident while traffic is expected
+    model_warmup_enabled: bool = True
+    ollama_keep_alive: str = "30m"  # Ollama keep_alive sent with every request
+    model_keep_warm_seconds: int = 1800  # keep reloading a model this long after its last use
+    model_warmup_check_seconds: int = 60
+    
+    # Cancelled turns: "discard" drops them, "save" stores the partial answer marked partial
+    partial_turn_policy: str = "discard"
+    disconnect_poll_seconds: float = 0.5
+    cancel_poll_seconds: float = 2  # how often a worker checks for cancels sent to another worker
+    
+    # Per-user limits on chat turns (0 disables); shared across workers unless SHARED_STATE_BACKEND=memory
+    rate_limit_turns_per_minute: int = 20
+    rate_limit_burst: int = 5
+    daily_token_quota: int = 0
+    usage_refresh_seconds: int = 60
+    
+    # Load shedding (see app/core/load_shedding.py)
+    load_shedding_enabled: bool = True
+    loop_lag_sample_seconds: float = 0.1
+    loop_lag_shed_ms: float = 200
+    loop_lag_critical_ms: float = 1000
+    max_inflight_requests: int = 500
+    llm_max_queue: int = 8
+    
+    # Slow-request capture (0 disables tracing)
+    slow_request_threshold_ms: float = 2000
+    slow_request_buffer_size: int = 100
+    profile_max_seconds: float = 60
+    
+    # Responses larger than this many bytes are gzip-compressed (0 disables)
+    gzip_minimum_size: int = 1024
     
     # Security
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    admin_emails: str = ""  # CSV of users allowed to use /v1/admin
+
+    # Commit retention / compaction (background maintenance)
+    # Policies are CSV: keep_last, daily, named. A commit survives if any policy keeps it.
+    retention_enabled: bool = True
+    retention_policies: str = "keep_last,daily,named"
+    retention_keep_last: int = 50
+    retention_auto_name_prefix: str = "auto:"
+    retention_max_delta_chain: int = 10
+    retention_interval_seconds: int = 3600
+    retention_batch_size: int = 50
+    retention_batch_pause_ms: int = 250
+    retention_full_pass_hours: int = 24  # other passes only visit chats with new commits
+
+    # Hot/cold tiering: idle chats and old commits move to compressed cold storage
+    tiering_enabled: bool = True
+    tiering_chat_idle_days: int = 7
+    tiering_commit_idle_days: int = 30
+    tiering_interval_seconds: int = 3600
+    tiering_batch_size: int = 50
+    tiering_batch_pause_ms: int = 250
+    tiering_compression_level: int = 6  # zlib level, 1 (fast) to 9 (small)
+
+    # Idempotency keys for chat turns and commits
+    idempotency_max_entries: int = 10000
+    idempotency_ttl_seconds: int = 600
+    idempotency_inflight_ttl_seconds: int = 300
+    idempotency_retry_grace_seconds: float = 10  # keyed turns whose client left are cancelled unless a retry attaches
+
+    # State shared between worker processes: memory (single worker), file (one host), mongo (any)
+    shared_state_backend: str = "memory"
+    shared_state_path: str = ".shared_state.sqlite3"
     
     # CORS (can be CSV or JSON array in .env)
     allowed_origins: Union[List[str], str] = ["http://localhost:5173", "http://localhost:3000"]
@@ -42,4 +125,21 @@ class Settings(BaseSettings):
             return [v.strip() for v in s.split(',') if v.strip()]
         return ["http://localhost:5173"]
 
+    def normalized_admin_emails(self) -> List[str]:
+        return [e.strip().lower() for e in self.admin_emails.split(',') if e.strip()]
+
+    def normalized_shard_urls(self) -> List[Tuple[str, str]]:
+        shards = []
+        for i, entry in enumerate(e.strip() for e in self.mongodb_shard_urls.split(',') if e.strip()):
+            name, sep, url = entry.partition('=')
+            # URLs contain '=' only after '?', so a bare URL is never mistaken for name=url
+            shards.append((name.strip(), url.strip()) if sep and '://' not in name else (f"shard{i}", entry))
+        return shards
+
+    def normalized_routing_heavy_keywords(self) -> List[str]:
+        return [k.strip().lower() for k in self.routing_heavy_keywords.split(',') if k.strip()]
+
+    def normalized_retention_policies(self) -> List[str]:
+        return [p.strip().lower() for p in self.retention_policies.split(',') if p.strip()]
+
 settings = Settings()
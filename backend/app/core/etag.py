@@ -0,0 +1,25 @@
+from typing import Optional
+
+from fastapi import Response
+
+# Responses are per user, and must be revalidated before reuse
+CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    # Weak: the same revision may be sent gzip-compressed or not
+    return 'W/"' + "-".join(str(p) for p in parts) + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    # Weak comparison ignores the W/ prefix
+    return "*" in candidates or etag.removeprefix("W/") in (c.removeprefix("W/") for c in candidates)
+
+def cache_headers(etag: Optional[str]) -> dict:
+    if etag is None:
+        return {}
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
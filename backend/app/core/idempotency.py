@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+from app.core.shared_state import SharedStateBackend, shared_state
+
+T = TypeVar("T")
+
+class IdempotencyConflict(Exception):
+    """Raised when a key is reused with a different request payload"""
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    future: asyncio.Future
+    expires_at: float
+    waiters: int = 0
+
+def fingerprint(payload: Any) -> str:
+    """Stable hash of a request payload"""
+    raw = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(raw).hexdigest()
+
+class IdempotencyStore:
+    """Bounded store of in-flight and completed results keyed by idempotency key.
+
+    The first request for a key runs the work; retries with the same key await
+    the same future, so they replay the completed result or wait for the
+    in-flight one instead of starting new work. Failed runs are forgotten so
+    the client can retry them. Entries are kept in insertion order, which is
+    also expiry order, so eviction only ever looks at the oldest entries.
+
+    With a shared backend, keys are also claimed there so a retry that lands
+    on another worker waits for and replays the JSON-encoded result.
+    """
+
+    poll_interval_seconds = 0.5
+
+    def __init__(self, max_entries: int, ttl_seconds: float, backend: Optional[SharedStateBackend] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, now: float):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+
+    async def run(self, key: str, request_fingerprint: str, func: Callable[[], Awaitable[T]]) -> T:
+        now = time.monotonic()
+        self._evict(now)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.fingerprint != request_fingerprint:
+                raise IdempotencyConflict("Idempotency key was already used with a different request")
+            entry.waiters += 1
+            try:
+                return await asyncio.shield(entry.future)
+            finally:
+                entry.waiters -= 1
+
+        future = asyncio.get_running_loop().create_future()
+        entry = _Entry(request_fingerprint, future, now + self.ttl_seconds)
+        self._entries[key] = entry
+        self._evict(now)
+
+        try:
+            if self.backend is None:
+                result = await func()
+            else:
+                result = await self._run_shared(key, request_fingerprint, func)
+        except BaseException as e:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Mark retrieved so an unawaited failure does not log a warning
+                future.exception()
+            raise
+
+        future.set_result(result)
+        return result
+
+    async def _run_shared(self, key: str, request_fingerprint: str, func: Callable[[], Awaitable[T]]) -> Any:
+        shared_key = f"idempotency:{key}"
+        while True:
+            claim = json.dumps({"fingerprint": request_fingerprint})
+            if await self.backend.add(shared_key, claim, settings.idempotency_inflight_ttl_seconds):
+                break
+            stored = await self.backend.get(shared_key)
+            if stored is None:
+                # Expired between add and get; try to claim again
+                continue
+            data = json.loads(stored)
+            if data["fingerprint"] != request_fingerprint:
+                raise IdempotencyConflict("Idempotency key was already used with a different request")
+            if "result" in data:
+                return data["result"]
+            # In flight on another worker; let it know a retry is waiting
+            await self.backend.set(f"{shared_key}:waiting", "1", self.poll_interval_seconds * 4)
+            await asyncio.sleep(self.poll_interval_seconds)
+
+        try:
+            result = await func()
+        except BaseException:
+            await self.backend.delete(shared_key)
+            raise
+        stored = json.dumps({"fingerprint": request_fingerprint, "result": jsonable_encoder(result)})
+        await self.backend.set(shared_key, stored, self.ttl_seconds)
+        return result
+
+    async def has_waiters(self, key: str) -> bool:
+        """Whether a retry is waiting on the in-flight run for key, on this worker or another"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.waiters:
+            return True
+        return self.backend is not None and await self.backend.get(f"idempotency:{key}:waiting") is not None
+
+def abandoned_check(
+    is_disconnected: Callable[[], Awaitable[bool]],
+    store: IdempotencyStore,
+    key: str,
+) -> Callable[[], Awaitable[bool]]:
+    """Disconnect check for keyed requests.
+
+    A client that sent a key may retry after a timeout, so its run is only
+    reported as abandoned once the client has been gone for
+    IDEMPOTENCY_RETRY_GRACE_SECONDS and no retry is waiting on it.
+    """
+    gone_since: Optional[float] = None
+
+    async def check() -> bool:
+        nonlocal gone_since
+        if gone_since is None:
+            if not await is_disconnected():
+                return False
+            gone_since = time.monotonic()
+        if await store.has_waiters(key):
+            return False
+        return time.monotonic() - gone_since >= settings.idempotency_retry_grace_seconds
+
+    return check
+
+def scoped_key(user_id: str, scope: str, key: Optional[str]) -> Optional[str]:
+    """Scope a client-supplied key to the user and endpoint"""
+    if not key:
+        return None
+    return f"{scope}:{user_id}:{key}"
+
+# The process-local futures already cover a single worker; only go through the backend when it is shared
+_idempotency_backend = None if settings.shared_state_backend.lower() == "memory" else shared_state
+
+chat_idempotency = IdempotencyStore(settings.idempotency_max_entries, settings.idempotency_ttl_seconds, _idempotency_backend)
+commit_idempotency = IdempotencyStore(settings.idempotency_max_entries, settings.idempotency_ttl_seconds, _idempotency_backend)
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import math
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.llm import ConcurrencyGate, llm_gate
+
+# Request priorities
+CRITICAL = "critical"  # health, auth, CORS preflight, cancels: never shed
+READ = "read"          # cheap GETs: shed only when the worker is badly behind
+WRITE = "write"        # other mutations: shed once the loop is lagging
+LLM = "llm"            # model generations: shed on LLM backlog or loop lag
+
+CRITICAL_PATHS = ("/", "/health")
+CRITICAL_PREFIXES = ("/v1/auth/",)
+LLM_ROUTES = {("POST", "/v1/chat"), ("POST", "/v1/commits/fanout")}
+# Cancelling a generation frees model capacity, so it must get through under load
+CANCEL_PREFIX, CANCEL_SUFFIX = "/v1/chat/", "/cancel"
+
+def classify(method: str, path: str) -> str:
+    if method == "OPTIONS" or path in CRITICAL_PATHS or path.startswith(CRITICAL_PREFIXES):
+        return CRITICAL
+    path = path.rstrip("/")
+    if method == "POST" and path.startswith(CANCEL_PREFIX) and path.endswith(CANCEL_SUFFIX):
+        return CRITICAL
+    if (method, path) in LLM_ROUTES:
+        return LLM
+    if method in ("GET", "HEAD"):
+        return READ
+    return WRITE
+
+class LoadMonitor:
+    """Tracks event-loop lag, in-flight requests and LLM backlog for this worker"""
+
+    def __init__(self, gate: ConcurrencyGate):
+        self.gate = gate
+        self.inflight = 0
+        self.lag_ms = 0.0
+        self.shed_count = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._sample())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _sample(self):
+        interval = settings.loop_lag_sample_seconds
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag_ms = max((time.perf_counter() - started - interval) * 1000, 0.0)
+            # React to spikes immediately, recover gradually
+            self.lag_ms = lag_ms if lag_ms > self.lag_ms else 0.8 * self.lag_ms + 0.2 * lag_ms
+
+    def should_shed(self, priority: str) -> Optional[Tuple[int, float, str]]:
+        """Return (status, retry_after_seconds, reason) if the request should be rejected"""
+        if priority == CRITICAL:
+            return None
+        overloaded = self.inflight >= settings.max_inflight_requests
+        if priority == LLM:
+            if self.gate.waiting >= settings.llm_max_queue:
+                return 429, self.gate.estimated_wait(), "Model queue is full"
+            if self.lag_ms >= settings.loop_lag_shed_ms or overloaded:
+                return 503, 1.0, "Server is busy"
+        elif priority == WRITE:
+            if self.lag_ms >= settings.loop_lag_shed_ms or overloaded:
+                return 503, 1.0, "Server is busy"
+        elif priority == READ:
+            if self.lag_ms >= settings.loop_lag_critical_ms or overloaded:
+                return 503, 1.0, "Server is busy"
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        if self.lag_ms >= settings.loop_lag_critical_ms or self.inflight >= settings.max_inflight_requests:
+            state = "overloaded"
+        elif self.lag_ms >= settings.loop_lag_shed_ms or self.gate.waiting >= settings.llm_max_queue:
+            state = "degraded"
+        else:
+            state = "healthy"
+        return {
+            "status": state,
+            "loopLagMs": round(self.lag_ms, 1),
+            "inflightRequests": self.inflight,
+            "shedRequests": self.shed_count,
+            "llm": {
+                "active": self.gate.active,
+                "waiting": self.gate.waiting,
+                "limit": self.gate.limit,
+                "maxQueue": settings.llm_max_queue,
+            },
+        }
+
+class LoadSheddingMiddleware:
+    """ASGI middleware that rejects low-priority or expensive work while the worker is saturated"""
+
+    def __init__(self, app, monitor: "LoadMonitor"):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.load_shedding_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        decision = self.monitor.should_shed(classify(scope["method"], scope["path"]))
+        if decision is not None:
+            self.monitor.shed_count += 1
+            status, retry_after, reason = decision
+            body = json.dumps({"detail": reason}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(math.ceil(retry_after), 1)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        self.monitor.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.inflight -= 1
+
+load_monitor = LoadMonitor(llm_gate)
@@ -0,0 +1,179 @@
+import asyncio
+import contextvars
+import signal
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from app.core.config import settings
+
+class RequestTrace:
+    """Per-request stage timings and the Mongo queries issued, for slow-request capture"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.stages: List[Dict[str, Any]] = []
+        self.queries: List[Tuple[AsyncIOMotorCollection, Dict[str, Any]]] = []
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("request_trace", default=None)
+
+@contextmanager
+def stage(name: str, collection: Optional[AsyncIOMotorCollection] = None, query: Optional[Dict[str, Any]] = None):
+    """Time a block of work; a no-op outside a traced request.
+
+    `collection` is the one the block queries, on whichever database or shard
+    it lives, so a captured query is explained where it actually ran.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    if collection is not None:
+        trace.queries.append((collection, query or {}))
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.stages.append({
+            "name": name,
+            "startMs": round((started - trace.started) * 1000, 2),
+            "durationMs": round((time.perf_counter() - started) * 1000, 2),
+        })
+
+def _shape(value: Any) -> Any:
+    """Replace literal values with their type names so captured filters hold no user data"""
+    if isinstance(value, dict):
+        return {k: _shape(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_shape(v) for v in value[:3]]
+    return type(value).__name__
+
+class SlowRequestLog:
+    """Bounded ring buffer of requests slower than the configured threshold"""
+
+    def __init__(self, size: int):
+        self.entries: Deque[Dict[str, Any]] = deque(maxlen=size)
+        # The loop only keeps weak references to tasks
+        self._explains: Set[asyncio.Task] = set()
+
+    def record(self, trace: RequestTrace, status: int, total_ms: float):
+        entry = {
+            "at": datetime.utcnow(),
+            "method": trace.method,
+            "path": trace.path,
+            "status": status,
+            "totalMs": round(total_ms, 2),
+            "stages": trace.stages,
+            "queries": [{"collection": c.name, "filter": _shape(q), "plan": None} for c, q in trace.queries],
+        }
+        self.entries.append(entry)
+        if trace.queries:
+            # Explain off the request path so capture does not slow the response further
+            task = asyncio.get_running_loop().create_task(self._explain(entry, trace.queries))
+            self._explains.add(task)
+            task.add_done_callback(self._explains.discard)
+
+    async def _explain(self, entry: Dict[str, Any], queries: List[Tuple[AsyncIOMotorCollection, Dict[str, Any]]]):
+        try:
+            for captured, (collection, query) in zip(entry["queries"], queries):
+                result = await collection.database.command(
+                    "explain", {"find": collection.name, "filter": query}, verbosity="queryPlanner"
+                )
+                winning = result.get("queryPlanner", {}).get("winningPlan", {})
+                captured["plan"] = _summarize_plan(winning)
+        except Exception as e:
+            entry["explainError"] = str(e)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return list(reversed(self.entries))
+
+def _summarize_plan(plan: Dict[str, Any]) -> List[str]:
+    """Flatten a winning plan to its stages, e.g. ["FETCH", "IXSCAN userId_1_chatId_1"]"""
+    stages = []
+    while plan:
+        label = plan.get("stage", "?")
+        if plan.get("indexName"):
+            label += f" {plan['indexName']}"
+        stages.append(label)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0] or plan.get("queryPlan")
+    return stages
+
+class SamplingProfiler:
+    """CPU sampling profiler for the event-loop thread.
+
+    A SIGPROF interval timer interrupts the interpreter every `interval_ms` of
+    CPU time and the handler records the current stack, so samples are not
+    biased towards GIL release points the way a sampling thread would be.
+    Output is collapsed stacks ("outer;inner count"), the input format of
+    flamegraph.pl and speedscope.
+    """
+
+    def __init__(self):
+        self.running = False
+
+    async def profile(self, seconds: float, interval_ms: float) -> str:
+        if self.running:
+            raise RuntimeError("A profile is already running")
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("Profiling requires the event loop to run in the main thread")
+
+        counts: Counter = Counter()
+
+        def on_sample(signum, frame):
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            counts[";".join(reversed(names))] += 1
+
+        self.running = True
+        previous = signal.signal(signal.SIGPROF, on_sample)
+        try:
+            signal.setitimer(signal.ITIMER_PROF, interval_ms / 1000, interval_ms / 1000)
+            await asyncio.sleep(seconds)
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, previous)
+            self.running = False
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+class RequestTracingMiddleware:
+    """ASGI middleware that traces each request and logs the slow ones"""
+
+    def __init__(self, app, log: SlowRequestLog):
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or settings.slow_request_threshold_ms <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope["method"], scope["path"])
+        token = _current_trace.set(trace)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            total_ms = (time.perf_counter() - trace.started) * 1000
+            if total_ms >= settings.slow_request_threshold_ms:
+                self.log.record(trace, status, total_ms)
+
+slow_request_log = SlowRequestLog(settings.slow_request_buffer_size)
+profiler = SamplingProfiler()
@@ -0,0 +1,199 @@
+import asyncio
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.db.database import get_database
+
+class SharedStateBackend(ABC):
+    """Key/value store with TTLs shared by every worker process.
+
+    Values are strings (callers serialize to JSON). Implementations must make
+    `add` and `incr` atomic across processes.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float):
+        ...
+
+    @abstractmethod
+    async def add(self, key: str, value: str, ttl: float) -> bool:
+        """Set key only if it is absent or expired; returns whether it was set"""
+
+    @abstractmethod
+    async def incr(self, key: str, amount: int, ttl: float) -> int:
+        """Atomically add to an integer counter, creating it with the given TTL"""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+class MemoryBackend(SharedStateBackend):
+    """Process-local backend; only correct with a single worker"""
+
+    def __init__(self):
+        self._items: Dict[str, Tuple[str, float]] = {}
+
+    def _live(self, key: str) -> Optional[str]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if item[1] <= time.monotonic():
+            del self._items[key]
+            return None
+        return item[0]
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._live(key)
+
+    async def set(self, key: str, value: str, ttl: float):
+        self._items[key] = (value, time.monotonic() + ttl)
+
+    async def add(self, key: str, value: str, ttl: float) -> bool:
+        if self._live(key) is not None:
+            return False
+        self._items[key] = (value, time.monotonic() + ttl)
+        return True
+
+    async def incr(self, key: str, amount: int, ttl: float) -> int:
+        current = self._live(key)
+        if current is None:
+            value, expires_at = amount, time.monotonic() + ttl
+        else:
+            value, expires_at = int(current) + amount, self._items[key][1]
+        self._items[key] = (str(value), expires_at)
+        return value
+
+    async def delete(self, key: str):
+        self._items.pop(key, None)
+
+class FileBackend(SharedStateBackend):
+    """SQLite-file backend shared by processes on one host; a stand-in for tests and single-node deployments"""
+
+    def __init__(self, path: str):
+        self.path = path
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def _run(self, fn):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            result = fn(conn, time.time())
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    async def get(self, key: str) -> Optional[str]:
+        def op(conn, now):
+            row = conn.execute("SELECT value FROM state WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            return row[0] if row else None
+        return await asyncio.to_thread(self._run, op)
+
+    async def set(self, key: str, value: str, ttl: float):
+        def op(conn, now):
+            conn.execute("INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl))
+        await asyncio.to_thread(self._run, op)
+
+    async def add(self, key: str, value: str, ttl: float) -> bool:
+        def op(conn, now):
+            conn.execute("DELETE FROM state WHERE key = ? AND expires_at <= ?", (key, now))
+            cur = conn.execute("INSERT OR IGNORE INTO state (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl))
+            return cur.rowcount == 1
+        return await asyncio.to_thread(self._run, op)
+
+    async def incr(self, key: str, amount: int, ttl: float) -> int:
+        def op(conn, now):
+            row = conn.execute("SELECT value, expires_at FROM state WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            value, expires_at = (int(row[0]) + amount, row[1]) if row else (amount, now + ttl)
+            conn.execute("INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)", (key, str(value), expires_at))
+            return value
+        return await asyncio.to_thread(self._run, op)
+
+    async def delete(self, key: str):
+        def op(conn, now):
+            conn.execute("DELETE FROM state WHERE key = ?", (key,))
+        await asyncio.to_thread(self._run, op)
+
+class MongoBackend(SharedStateBackend):
+    """Backend on the application database, shared by every replica"""
+
+    collection_name = "shared_state"
+
+    async def _collection(self):
+        db = await get_database()
+        return db[self.collection_name]
+
+    async def get(self, key: str) -> Optional[str]:
+        coll = await self._collection()
+        doc = await coll.find_one({"_id": key, "expiresAt": {"$gt": datetime.utcnow()}})
+        return str(doc["value"]) if doc else None
+
+    async def set(self, key: str, value: str, ttl: float):
+        coll = await self._collection()
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        await coll.update_one({"_id": key}, {"$set": {"value": value, "expiresAt": expires_at}}, upsert=True)
+
+    async def add(self, key: str, value: str, ttl: float) -> bool:
+        coll = await self._collection()
+        now = datetime.utcnow()
+        try:
+            # Matches only an expired document; otherwise the upsert collides on _id
+            await coll.update_one(
+                {"_id": key, "expiresAt": {"$lte": now}},
+                {"$set": {"value": value, "expiresAt": now + timedelta(seconds=ttl)}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def incr(self, key: str, amount: int, ttl: float) -> int:
+        coll = await self._collection()
+        now = datetime.utcnow()
+        # Reset counters whose window has expired before incrementing
+        await coll.delete_one({"_id": key, "expiresAt": {"$lte": now}})
+        doc = await coll.find_one_and_update(
+            {"_id": key},
+            {"$inc": {"value": amount}, "$setOnInsert": {"expiresAt": now + timedelta(seconds=ttl)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["value"]
+
+    async def delete(self, key: str):
+        coll = await self._collection()
+        await coll.delete_one({"_id": key})
+
+def create_backend() -> SharedStateBackend:
+    kind = settings.shared_state_backend.lower()
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "file":
+        return FileBackend(settings.shared_state_path)
+    if kind == "mongo":
+        return MongoBackend()
+    raise ValueError(f"Unknown shared state backend: {settings.shared_state_backend}")
+
+shared_state = create_backend()
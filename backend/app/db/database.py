@@ -1,10 +1,20 @@
+import asyncio
+import hashlib
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from typing import Optional
+from pymongo.errors import OperationFailure
+from typing import Any, Dict, Iterable, List, Optional
 from app.core.config import settings
 
+# Collections holding per-user data; these follow the user's deployment and shard on userId
+USER_COLLECTIONS = ("chats", "commits", "usage", "cold_storage")
+
 class Database:
     client: Optional[AsyncIOMotorClient] = None
     database: Optional[AsyncIOMotorDatabase] = None
+    # Independent deployments user data is spread across, by name
+    shards: Dict[str, AsyncIOMotorDatabase] = {}
+    # Outcome of create_indexes (it may run in the background), reported by /health
+    index_status: Dict[str, Any] = {"state": "pending", "error": None}
 
 db = Database()
 
@@ -14,6 +24,26 @@ async def get_database() -> AsyncIOMotorDatabase:
         await connect_to_mongo()
     return db.database
 
+def rendezvous(user_id: str, names: Iterable[str]) -> str:
+    """Pick a deployment by rendezvous hashing, so adding one moves only the users
+    that now hash highest to it"""
+    return max(names, key=lambda name: hashlib.sha1(f"{name}:{user_id}".encode()).digest())
+
+def deployment_for_user(user_id: str) -> Optional[str]:
+    """Name of the deployment holding a user's data (None without MONGODB_SHARD_URLS)"""
+    return rendezvous(user_id, db.shards) if db.shards else None
+
+async def get_user_database(user_id: str) -> AsyncIOMotorDatabase:
+    """Database holding a user's chats, commits and usage"""
+    primary = await get_database()
+    name = deployment_for_user(user_id)
+    return primary if name is None else db.shards[name]
+
+async def get_user_databases() -> List[AsyncIOMotorDatabase]:
+    """Every database holding user data, for background jobs"""
+    primary = await get_database()
+    return list(db.shards.values()) or [primary]
+
 async def connect_to_mongo():
     """Create database connection"""
     try:
@@ -24,36 +54,126 @@ async def connect_to_mongo():
         await db.client.admin.command('ping')
         print(f"✅ Connected to MongoDB: {settings.database_name}")
         
+        shards = {name: AsyncIOMotorClient(url)[settings.database_name] for name, url in settings.normalized_shard_urls()}
+        await asyncio.gather(*(shard.client.admin.command('ping') for shard in shards.values()))
+        db.shards = shards
+        if shards:
+            print(f"✅ Connected to {len(shards)} user data deployments: {', '.join(shards)}")
+            shard_urls = {url for _, url in settings.normalized_shard_urls()}
+            if settings.mongodb_url not in shard_urls and await db.database.chats.find_one({}, {"_id": 1}):
+                print("⚠️ MONGODB_URL still holds chats that MONGODB_SHARD_URLS no longer routes to; run scripts/migrate_shards.py")
+        
     except Exception as e:
         print(f"❌ Failed to connect to MongoDB: {e}")
         raise
 
 async def close_mongo_connection():
     """Close database connection"""
+    for shard in db.shards.values():
+        shard.client.close()
+    db.shards = {}
     if db.client:
         db.client.close()
         print("🔌 MongoDB connection closed")
 
+async def dedupe_chats(database: AsyncIOMotorDatabase) -> int:
+    """Delete duplicate {userId, chatId} chats left by the old check-then-insert chat creation,
+    keeping the copy with the most messages, so the unique index can be built; returns chats removed"""
+    groups = await database.chats.aggregate([
+        {"$group": {
+            "_id": {"userId": "$userId", "chatId": "$chatId"},
+            "copies": {"$push": {"id": "$_id", "messages": {"$size": {"$ifNull": ["$messages", []]}}}},
+            "count": {"$sum": 1},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True).to_list(None)
+    removed = 0
+    for group in groups:
+        # Turns only ever landed on one copy; the others are empty leftovers
+        copies = sorted(group["copies"], key=lambda c: c["messages"], reverse=True)
+        result = await database.chats.delete_many({"_id": {"$in": [c["id"] for c in copies[1:]]}, "userId": group["_id"]["userId"]})
+        removed += result.deleted_count
+    if removed:
+        print(f"🧹 Removed {removed} duplicate chats before building the unique chat index")
+    return removed
+
 # Create indexes for better performance
+async def create_user_data_indexes(database: AsyncIOMotorDatabase):
+    """Indexes (and, on a sharded cluster, shard keys) for the per-user collections.
+    Every unique index is prefixed by userId so it stays valid once sharded."""
+    
+    async def chats():
+        await database.chats.create_index("chatId")
+        await database.chats.create_index("userId")
+        info = await database.chats.index_information()
+        if not info.get("userId_1_chatId_1", {}).get("unique"):
+            # Deployments from before the index may hold duplicates that would make the build fail
+            await dedupe_chats(database)
+        await database.chats.create_index([("userId", 1), ("chatId", 1)], unique=True)
+        await database.chats.create_index([("userId", 1), ("updated_at", -1)])
+        await database.chats.create_index("baseCommitId", sparse=True)
+        await database.chats.create_index("updated_at")
+    
+    async def commits():
+        if settings.mongodb_sharded:
+            # A unique index without the shard key prefix blocks sharding
+            info = await database.commits.index_information()
+            if info.get("commitId_1", {}).get("unique"):
+                await database.commits.drop_index("commitId_1")
+            await database.commits.create_index("commitId")
+        else:
+            await database.commits.create_index("commitId", unique=True)
+        await database.commits.create_index([("userId", 1), ("commitId", 1)], unique=True)
+        await database.commits.create_index([("userId", 1), ("chatId", 1), ("timestamp", 1)])
+        await database.commits.create_index("chatId")
+        await database.commits.create_index("timestamp")
+        await database.commits.create_index("baseCommitId", sparse=True)
+    
+    async def usage():
+        await database.usage.create_index([("userId", 1), ("day", -1)])
+    
+    async def cold_storage():
+        await database.cold_storage.create_index("userId")
+    
+    await asyncio.gather(chats(), commits(), usage(), cold_storage())
+    
+    if settings.mongodb_sharded:
+        await shard_user_collections(database)
+
+async def shard_user_collections(database: AsyncIOMotorDatabase):
+    """Shard the per-user collections on hashed userId (database must be behind a mongos)"""
+    admin = database.client.admin
+    await admin.command("enableSharding", database.name)
+    for name in USER_COLLECTIONS:
+        await database[name].create_index([("userId", "hashed")])
+        try:
+            await admin.command("shardCollection", f"{database.name}.{name}", key={"userId": "hashed"})
+        except OperationFailure as e:
+            # AlreadyInitialized: sharded by an earlier startup
+            if e.code != 23:
+                raise
+    print(f"🧩 Sharded {', '.join(USER_COLLECTIONS)} on hashed userId")
+
 async def create_indexes():
-    """Create database indexes"""
+    """Create database indexes (concurrently across collections and deployments)"""
     try:
         database = await get_database()
         
-        # Users collection indexes
-        await database.users.create_index("email", unique=True)
+        async def users():
+            await database.users.create_index("email", unique=True)
         
-        # Chats collection indexes
-        await database.chats.create_index("chatId")
-        await database.chats.create_index("userId")
+        async def shared_state():
+            # Shared worker state (idempotency results, locks, counters)
+            await database.shared_state.create_index("expiresAt", expireAfterSeconds=0)
         
-        # Commits collection indexes
-        await database.commits.create_index("commitId", unique=True)
-        await database.commits.create_index("chatId")
-        await database.commits.create_index("timestamp")
+        user_databases = await get_user_databases()
+        await asyncio.gather(users(), shared_state(), *(create_user_data_indexes(d) for d in user_databases))
         
+        db.index_status = {"state": "ready", "error": None}
         print("📊 Database indexes created successfully")
         
     except Exception as e:
+        # Usually run as a background task, so nothing else would surface this
+        db.index_status = {"state": "failed", "error": str(e)}
         print(f"❌ Failed to create indexes: {e}")
         raise
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class Message(BaseModel):
@@ -8,6 +8,11 @@ class Message(BaseModel):
     role: str = Field(..., description="Role of the message sender (user/assistant)")
     content: str = Field(..., description="Content of the message")
     timestamp: Optional[datetime] = Field(default_factory=datetime.utcnow)
+    partial: Optional[bool] = Field(default=None, description="Set when generation was cancelled before completing")
+    usage: Optional[Dict[str, int]] = Field(default=None, description="promptTokens/completionTokens reported by Ollama")
+    model: Optional[str] = Field(default=None, description="Model that generated an assistant message")
+    route: Optional[str] = Field(default=None, description="Routing decision (fast/large) behind the model choice")
+    latencyMs: Optional[int] = Field(default=None, description="Time to generate an assistant message, including queueing")
 
 class User(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
@@ -24,7 +29,11 @@ class Chat(BaseModel):
     id: Optional[str] = Field(default=None, alias="_id")
     chatId: str = Field(..., description="Unique chat identifier")
     userId: str = Field(..., description="User who owns this chat")
-    messages: List[Message] = Field(default_factory=list, description="List of messages in the chat")
+    messages: List[Message] = Field(default_factory=list, description="List of messages in the chat (only turns after the fork when baseCommitId is set)")
+    baseCommitId: Optional[str] = Field(default=None, description="Commit whose history this forked chat shares")
+    baseCount: Optional[int] = Field(default=None, description="Number of messages shared from baseCommitId")
+    forkedFromChatId: Optional[str] = Field(default=None, description="Chat the fork was created from")
+    tier: Optional[str] = Field(default=None, description="\"cold\" when messages were moved to cold storage")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -36,5 +45,8 @@ class Commit(BaseModel):
     chatId: str = Field(..., description="Chat this commit belongs to")
     userId: str = Field(..., description="User who created this commit")
     name: str = Field(..., min_length=1, max_length=200, description="Commit name/description")
-    messages: List[Message] = Field(..., description="Snapshot of messages at commit time")
+    messages: List[Message] = Field(..., description="Snapshot of messages at commit time (suffix only when baseCommitId is set)")
+    messageCount: Optional[int] = Field(default=None, description="Number of messages in the full snapshot")
+    baseCommitId: Optional[str] = Field(default=None, description="Earlier commit this delta extends")
+    tier: Optional[str] = Field(default=None, description="\"cold\" when messages were moved to cold storage")
     timestamp: datetime = Field(default_factory=datetime.utcnow)
@@ -20,10 +20,13 @@ class Token(BaseModel):
 class ChatRequest(BaseModel):
     chatId: str = Field(..., description="Unique chat identifier")
     userMessage: str = Field(..., min_length=1, description="User's message")
+    route: Optional[str] = Field(default=None, description="Force a model route (fast/large) instead of automatic routing")
 
 class ChatResponse(BaseModel):
     chatId: str
     assistantMessage: str
+    model: Optional[str] = None
+    route: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 # Commit schemas
@@ -45,6 +48,25 @@ class FetchResponse(BaseModel):
     restoredMessages: List[dict] = Field(..., description="Restored messages")
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
+# Fork schemas
+class ForkRequest(BaseModel):
+    name: Optional[str] = Field(default=None, min_length=1, max_length=100, description="Name of the new chat")
+
+class ForkResponse(BaseModel):
+    chatId: str
+    name: str
+    forkedFromCommitId: str
+    forkedFromChatId: str
+    messageCount: int = Field(..., description="Number of messages shared with the source commit")
+    updatedAt: datetime
+
+# Fan-out schemas
+class FanoutRequest(BaseModel):
+    userMessage: str = Field(..., min_length=1, description="Message sent to every target")
+    commitIds: List[str] = Field(default_factory=list, description="Commit snapshots to use as context")
+    chatId: Optional[str] = Field(default=None, description="Also use the chat's current history as a context")
+    models: List[str] = Field(default_factory=list, description="Models or routes to run; empty routes each context automatically")
+
 # Commit history schemas
 class CommitHistoryItem(BaseModel):
     commitId: str
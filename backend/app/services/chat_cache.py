@@ -0,0 +1,154 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import encode as bson_encode
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import settings
+
+class _Entry:
+    __slots__ = ("doc", "size", "base")
+
+    def __init__(self, doc: Dict[str, Any], size: int):
+        self.doc = doc
+        self.size = size
+        # Resolved history a forked chat shares with its base commit (immutable)
+        self.base: Optional[List[Dict[str, Any]]] = None
+
+    @property
+    def revision(self) -> int:
+        return self.doc.get("revision", 0)
+
+def revision_filter(revision: int) -> Any:
+    # Chats written before revisions existed have no field at all
+    return revision if revision else {"$in": [0, None]}
+
+class ChatCache:
+    """Bounded LRU of hot chat documents, versioned by the chat's `revision`.
+
+    Cached documents are treated as immutable snapshots: writes go to Mongo
+    first, guarded on the cached revision, and only then replace the entry
+    (write-through with optimistic concurrency). Every write that changes a
+    chat's messages bumps its revision. With several workers
+    (SHARED_STATE_BACKEND other than memory), a hit is confirmed with a
+    revision-only lookup, so another worker's write is never served stale.
+    A single worker trusts its entries and reads nothing.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.chat_cache_max_mb > 0
+
+    @property
+    def max_bytes(self) -> int:
+        return int(settings.chat_cache_max_mb * 1024 * 1024)
+
+    @staticmethod
+    def shared() -> bool:
+        return settings.shared_state_backend.lower() != "memory"
+
+    def peek(self, chat_id: str, user_id: str) -> Optional[_Entry]:
+        return self._entries.get((user_id, chat_id))
+
+    async def get(
+        self,
+        chat_id: str,
+        user_id: str,
+        db: AsyncIOMotorDatabase,
+        revision: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Read-through lookup; `revision` is the chat's current revision if the caller already read it"""
+        key = (user_id, chat_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if revision is None and self.shared():
+                current = await db.chats.find_one({"chatId": chat_id, "userId": user_id}, {"revision": 1, "_id": 0})
+                revision = current.get("revision", 0) if current else -1
+            if revision is None or revision == entry.revision:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.doc
+            self.invalidate(chat_id, user_id)
+        self.misses += 1
+        doc = await db.chats.find_one({"chatId": chat_id, "userId": user_id})
+        if doc is not None:
+            self.put(doc)
+        return doc
+
+    def put(self, doc: Dict[str, Any]):
+        # Cold chats have no messages to serve; they are cached once rehydrated
+        if not self.enabled or doc.get("tier"):
+            return
+        key = (doc["userId"], doc["chatId"])
+        size = len(bson_encode(doc))
+        if size > self.max_bytes:
+            self.invalidate(doc["chatId"], doc["userId"])
+            return
+        self._store(key, _Entry(doc, size))
+
+    def _store(self, key: Tuple[str, str], entry: _Entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old.size
+        self._entries[key] = entry
+        self.bytes += entry.size
+        self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.size
+
+    def invalidate(self, chat_id: str, user_id: str):
+        entry = self._entries.pop((user_id, chat_id), None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def appended(self, chat_id: str, user_id: str, messages: List[Dict[str, Any]], fields: Dict[str, Any]):
+        """Apply a successful guarded append to the cached copy (as a new snapshot)"""
+        key = (user_id, chat_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        doc = {**entry.doc, **fields, "messages": entry.doc.get("messages", []) + messages, "revision": entry.revision + 1}
+        updated = _Entry(doc, entry.size + sum(len(bson_encode(m)) for m in messages))
+        updated.base = entry.base
+        self._store(key, updated)
+
+    def _fork_entry(self, chat: Dict[str, Any]) -> Optional[_Entry]:
+        # Callers may pass a projection without chatId (retention does); those are not cached
+        if "chatId" not in chat:
+            return None
+        return self._entries.get((chat["userId"], chat["chatId"]))
+
+    def fork_base(self, chat: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        entry = self._fork_entry(chat)
+        if entry is None or entry.doc.get("baseCommitId") != chat.get("baseCommitId"):
+            return None
+        return entry.base
+
+    def remember_fork_base(self, chat: Dict[str, Any], base: List[Dict[str, Any]]):
+        entry = self._fork_entry(chat)
+        if entry is not None and entry.doc.get("baseCommitId") == chat.get("baseCommitId") and entry.base is None:
+            entry.base = base
+            size = len(bson_encode({"m": base}))
+            entry.size += size
+            self.bytes += size
+            self._evict()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "mb": round(self.bytes / 1024 / 1024, 2),
+            "maxMb": settings.chat_cache_max_mb,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+chat_cache = ChatCache()
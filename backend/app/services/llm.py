@@ -0,0 +1,108 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+
+class OllamaClient:
+    """Minimal async client for the Ollama HTTP API"""
+
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so importing this module stays cheap
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout)
+        return self._client
+
+    async def generate(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run a non-streaming completion and return Ollama's response document"""
+        response = await self.client.post("/api/generate", json={
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "options": options or {},
+            "keep_alive": settings.ollama_keep_alive,
+        })
+        response.raise_for_status()
+        return response.json()
+
+    async def stream_generate(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream completion chunks; closing the iterator (e.g. on cancellation) drops the
+        connection, which makes Ollama abort the generation and free the slot"""
+        async with self.client.stream("POST", "/api/generate", json={
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "options": options or {},
+            "keep_alive": settings.ollama_keep_alive,
+        }) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                yield chunk
+                if chunk.get("done"):
+                    return
+
+    async def load(self, model: str, keep_alive: str):
+        """Load a model into memory without generating (an empty prompt only loads it)"""
+        response = await self.client.post("/api/generate", json={"model": model, "keep_alive": keep_alive, "stream": False})
+        response.raise_for_status()
+
+    async def loaded_models(self) -> List[str]:
+        """Names of the models currently resident in Ollama"""
+        response = await self.client.get("/api/ps")
+        response.raise_for_status()
+        return [m["name"] for m in response.json().get("models", [])]
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class ConcurrencyGate:
+    """Caps concurrent generations and exposes queue depth for load shedding"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self.avg_seconds: Optional[float] = None
+        self._semaphore = asyncio.Semaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+            elapsed = time.perf_counter() - started
+            self.avg_seconds = elapsed if self.avg_seconds is None else 0.8 * self.avg_seconds + 0.2 * elapsed
+
+    def estimated_wait(self) -> float:
+        """Rough seconds until a newly queued generation would start"""
+        per_generation = self.avg_seconds if self.avg_seconds is not None else 30.0
+        return (self.waiting + 1) / self.limit * per_generation
+
+ollama_client = OllamaClient(settings.ollama_base_url, settings.ollama_timeout_seconds)
+llm_gate = ConcurrencyGate(settings.llm_max_concurrency)
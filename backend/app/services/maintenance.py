@@ -0,0 +1,268 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from bson import encode as bson_encode
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import settings
+from app.core.shared_state import shared_state
+from app.db.database import get_user_databases
+from app.services.services import CommitService, detach_dependents, resolve_chat_messages
+from app.services.tiering import cold_commit_messages, discard_cold_commits, rehydrate_commit, tiering_service
+
+# Incremental passes also revisit chats committed shortly before the last pass, in case worker clocks disagree
+CLOCK_SKEW_MARGIN = timedelta(minutes=5)
+
+def _retention_config() -> str:
+    """Settings a pass depends on; changing any of them forces a full pass"""
+    return "|".join([
+        ",".join(settings.normalized_retention_policies()),
+        str(settings.retention_keep_last),
+        settings.retention_auto_name_prefix,
+        str(settings.retention_max_delta_chain),
+    ])
+
+class RetentionService:
+    """Applies commit retention policies and compacts surviving snapshots into deltas.
+
+    Policies only drop commits, and compaction only has work, once a chat gets
+    a new commit. So a pass visits just the chats committed to since the
+    previous one, tracked per database in `maintenance`. A full pass over every
+    chat runs every RETENTION_FULL_PASS_HOURS (to collect commits of deleted
+    chats) and whenever the retention settings change.
+    """
+
+    def __init__(self):
+        self.commit_service = CommitService()
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    def select_kept(self, commits: List[Dict[str, Any]]) -> Set[str]:
+        """Return the commitIds that survive the configured policies (commits sorted oldest first)"""
+        policies = settings.normalized_retention_policies()
+        if not policies:
+            return {c["commitId"] for c in commits}
+
+        kept: Set[str] = set()
+        if "keep_last" in policies and settings.retention_keep_last > 0:
+            kept.update(c["commitId"] for c in commits[-settings.retention_keep_last:])
+        if "daily" in policies:
+            last_per_day: Dict[Any, str] = {}
+            for c in commits:
+                last_per_day[c["timestamp"].date()] = c["commitId"]
+            kept.update(last_per_day.values())
+        if "named" in policies:
+            prefix = settings.retention_auto_name_prefix
+            kept.update(c["commitId"] for c in commits if not (prefix and c.get("name", "").startswith(prefix)))
+        # Never drop the latest checkpoint of a chat
+        if commits:
+            kept.add(commits[-1]["commitId"])
+        return kept
+
+    async def compact_chat(self, chat_id: str, user_id: str, db: AsyncIOMotorDatabase) -> Dict[str, int]:
+        stats = {"deleted": 0, "compacted": 0, "bytesReclaimed": 0}
+        commits = await db.commits.find({"chatId": chat_id, "userId": user_id}).sort("timestamp", 1).to_list(None)
+        if not commits:
+            return stats
+
+        size_before = sum(len(bson_encode(c)) for c in commits)
+
+        # Commits whose chat is gone are unreferenced: collect them outright
+        chat = await db.chats.find_one({"chatId": chat_id, "userId": user_id}, {"chatId": 1, "userId": 1, "baseCommitId": 1})
+        if not chat:
+            # Forks of these commits keep their history
+            await detach_dependents([c["commitId"] for c in commits], user_id, db, exclude_chat_id=chat_id)
+            result = await db.commits.delete_many({"chatId": chat_id, "userId": user_id})
+            await discard_cold_commits([c["commitId"] for c in commits], user_id, db)
+            stats["deleted"] = result.deleted_count
+            stats["bytesReclaimed"] = size_before
+            return stats
+
+        # Materialize every snapshot (bases are always older, so one ordered pass suffices);
+        # cold commits are read through cold storage without moving them back
+        stored: Dict[str, List[Dict[str, Any]]] = {}
+        resolved: Dict[str, List[Dict[str, Any]]] = {}
+        for c in commits:
+            stored[c["commitId"]] = await cold_commit_messages(c, db)
+            base_id = c.get("baseCommitId")
+            if base_id is None:
+                resolved[c["commitId"]] = list(stored[c["commitId"]])
+            elif base_id in resolved:
+                resolved[c["commitId"]] = resolved[base_id] + stored[c["commitId"]]
+            else:
+                resolved[c["commitId"]] = await self.commit_service.resolve_commit_messages(c, db)
+
+        kept = self.select_kept(commits)
+        # Commits that forks (or their commits) share by reference must survive
+        ids = [c["commitId"] for c in commits]
+        kept.update(await db.chats.distinct("baseCommitId", {"userId": user_id, "baseCommitId": {"$in": ids}}))
+        kept.update(await db.commits.distinct("baseCommitId", {"userId": user_id, "chatId": {"$ne": chat_id}, "baseCommitId": {"$in": ids}}))
+
+        # Rewrite survivors first so no delta ever points at a commit that is about to be deleted
+        size_after = 0
+        prev_id: Optional[str] = None
+        prev_messages: Optional[List[Dict[str, Any]]] = None
+        if chat.get("baseCommitId"):
+            # A forked chat's first commit can stay a delta on the fork base
+            prev_id = chat["baseCommitId"]
+            prev_messages = await resolve_chat_messages({**chat, "messages": []}, db)
+        depth = 0
+        for c in commits:
+            if c["commitId"] not in kept:
+                continue
+            messages = resolved[c["commitId"]]
+            is_delta = (
+                prev_messages is not None
+                and depth < settings.retention_max_delta_chain
+                and messages[:len(prev_messages)] == prev_messages
+            )
+            if is_delta:
+                target = {"messages": messages[len(prev_messages):], "baseCommitId": prev_id}
+                depth += 1
+            else:
+                target = {"messages": messages, "baseCommitId": None}
+                depth = 0
+
+            if c.get("baseCommitId") != target["baseCommitId"] or stored[c["commitId"]] != target["messages"]:
+                # Rewritten commits come back hot (dropping their cold copy); tiering demotes them again
+                if c.get("tier") and await rehydrate_commit(c, db) is None:
+                    continue
+                update: Dict[str, Any] = {"$set": {"messages": target["messages"], "messageCount": len(messages)}}
+                if is_delta:
+                    update["$set"]["baseCommitId"] = prev_id
+                else:
+                    update["$unset"] = {"baseCommitId": ""}
+                # Guarded on the hot tier: a commit demoted meanwhile is left for the next pass
+                result = await db.commits.update_one(
+                    {"commitId": c["commitId"], "userId": user_id, "tier": {"$exists": False}}, update
+                )
+                stats["compacted"] += result.modified_count
+
+            rewritten = {**c, "messages": target["messages"], "messageCount": len(messages)}
+            if is_delta:
+                rewritten["baseCommitId"] = prev_id
+            else:
+                rewritten.pop("baseCommitId", None)
+            size_after += len(bson_encode(rewritten))
+
+            prev_id, prev_messages = c["commitId"], messages
+
+        dropped = [c["commitId"] for c in commits if c["commitId"] not in kept]
+        if dropped:
+            result = await db.commits.delete_many({"commitId": {"$in": dropped}, "userId": user_id})
+            await discard_cold_commits(dropped, user_id, db)
+            stats["deleted"] = result.deleted_count
+            # Invalidate cached commit history
+            await db.chats.update_one({"chatId": chat_id, "userId": user_id}, {"$inc": {"commitRevision": 1}})
+
+        stats["bytesReclaimed"] = max(size_before - size_after, 0)
+        return stats
+
+    async def run_once(self, db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+        """One full maintenance pass, processed in throttled batches of chats"""
+        started = time.perf_counter()
+        report: Dict[str, Any] = {
+            "startedAt": datetime.utcnow(),
+            "chats": 0,
+            "commitsDeleted": 0,
+            "commitsCompacted": 0,
+            "bytesReclaimed": 0,
+        }
+
+        config = _retention_config()
+        state = await db.maintenance.find_one({"_id": "retention"}) or {}
+        full_pass_at = state.get("fullPassAt")
+        full = (
+            state.get("config") != config
+            or full_pass_at is None
+            or report["startedAt"] - full_pass_at >= timedelta(hours=settings.retention_full_pass_hours)
+        )
+        report["fullPass"] = full
+        pipeline: List[Dict[str, Any]] = []
+        if not full:
+            pipeline.append({"$match": {"timestamp": {"$gte": state["since"] - CLOCK_SKEW_MARGIN}}})
+        pipeline.append({"$group": {"_id": {"userId": "$userId", "chatId": "$chatId"}}})
+        pairs = await db.commits.aggregate(pipeline).to_list(None)
+
+        batch_size = max(settings.retention_batch_size, 1)
+        for i in range(0, len(pairs), batch_size):
+            for pair in pairs[i:i + batch_size]:
+                try:
+                    stats = await self.compact_chat(pair["_id"]["chatId"], pair["_id"]["userId"], db)
+                except Exception as e:
+                    # One broken chat must not stop the pass for everyone else
+                    print(f"❌ Retention failed for chat {pair['_id']['chatId']}: {e}")
+                    continue
+                report["chats"] += 1
+                report["commitsDeleted"] += stats["deleted"]
+                report["commitsCompacted"] += stats["compacted"]
+                report["bytesReclaimed"] += stats["bytesReclaimed"]
+            # Yield to live traffic between batches
+            await asyncio.sleep(settings.retention_batch_pause_ms / 1000)
+
+        await db.maintenance.update_one(
+            {"_id": "retention"},
+            {"$set": {
+                "since": report["startedAt"],
+                "config": config,
+                "fullPassAt": report["startedAt"] if full else full_pass_at,
+            }},
+            upsert=True,
+        )
+
+        report["durationSeconds"] = round(time.perf_counter() - started, 3)
+        self.last_report = report
+        print(
+            f"🧹 Retention pass ({'full' if full else 'incremental'}): {report['chats']} chats, {report['commitsDeleted']} commits deleted, "
+            f"{report['commitsCompacted']} compacted, {report['bytesReclaimed'] / 1024:.1f} KB reclaimed"
+        )
+        return report
+
+class MaintenanceWorker:
+    """Background task that periodically runs one maintenance job"""
+
+    def __init__(self, name: str, job: Callable[[AsyncIOMotorDatabase], Awaitable[Any]], interval_seconds: int, enabled: bool):
+        self.name = name
+        self.job = job
+        self.interval_seconds = interval_seconds
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                # Only one worker per interval runs the pass
+                if not await shared_state.add(f"maintenance:{self.name}", str(os.getpid()), self.interval_seconds):
+                    continue
+                for db in await get_user_databases():
+                    await self.job(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ {self.name.capitalize()} pass failed: {e}")
+
+retention_service = RetentionService()
+maintenance_worker = MaintenanceWorker(
+    "retention", retention_service.run_once, settings.retention_interval_seconds, settings.retention_enabled
+)
+tiering_worker = MaintenanceWorker(
+    "tiering", tiering_service.run_once, settings.tiering_interval_seconds, settings.tiering_enabled
+)
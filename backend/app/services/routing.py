@@ -0,0 +1,68 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.warmup import model_warmer
+
+FAST = "fast"
+LARGE = "large"
+
+_CODE_HINTS = re.compile(r"```|\bdef |\bclass |\bfunction\b|=>|#include|\bimport |Traceback")
+
+@dataclass
+class RouteDecision:
+    route: str
+    model: str
+
+class ModelRouter:
+    """Picks the model for a chat turn.
+
+    Short conversational turns with little history go to the fast model;
+    anything long, code-bearing or matching a heavy keyword goes to the large
+    one. Routing is off (everything goes to OLLAMA_MODEL) until
+    OLLAMA_FAST_MODEL is set. While the chosen model is still loading, a
+    warm alternative is used instead.
+    """
+
+    def routes(self) -> Dict[str, str]:
+        routes = {LARGE: settings.ollama_model}
+        if settings.ollama_fast_model:
+            routes[FAST] = settings.ollama_fast_model
+        return routes
+
+    def is_heavy(self, user_message: str, history: List[Dict[str, Any]]) -> bool:
+        if len(user_message) > settings.routing_fast_max_chars:
+            return True
+        if sum(len(m.get("content", "")) for m in history) > settings.routing_fast_max_history_chars:
+            return True
+        if _CODE_HINTS.search(user_message):
+            return True
+        words = set(re.findall(r"[a-z]+", user_message.lower()))
+        return any(k in words for k in settings.normalized_routing_heavy_keywords())
+
+    def for_model(self, name: str) -> RouteDecision:
+        """Decision for an explicitly requested route name or configured model"""
+        routes = self.routes()
+        if name in routes:
+            return RouteDecision(name, routes[name])
+        for route, model in routes.items():
+            if model == name:
+                return RouteDecision(route, model)
+        raise ValueError(f"Unknown model '{name}', expected one of: {', '.join([*routes, *routes.values()])}")
+
+    def route(self, user_message: str, history: List[Dict[str, Any]], override: Optional[str] = None) -> RouteDecision:
+        routes = self.routes()
+        if override is not None:
+            if override not in routes:
+                raise ValueError(f"Unknown model route '{override}'")
+            return RouteDecision(override, routes[override])
+        route = LARGE if FAST not in routes or self.is_heavy(user_message, history) else FAST
+        model_warmer.want(routes[route])
+        if not model_warmer.is_ready(routes[route]):
+            warm = next((r for r, m in routes.items() if model_warmer.is_ready(m)), None)
+            if warm is not None:
+                route = warm
+        return RouteDecision(route, routes[route])
+
+model_router = ModelRouter()
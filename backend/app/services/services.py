@@ -1,41 +1,152 @@
+import asyncio
+import time
 import uuid
+from contextlib import aclosing
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Any, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
-
-from langchain.memory import ConversationBufferMemory
-from langchain_community.llms import Ollama
-from langchain.schema import HumanMessage, AIMessage
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 from app.core.config import settings
+from app.core.profiling import stage
+from app.core.shared_state import shared_state
+from app.services.chat_cache import chat_cache, revision_filter
+from app.services.llm import llm_gate, ollama_client
+from app.services.routing import RouteDecision, model_router
+from app.services.tiering import cold_commit_messages, discard_cold_chat, discard_cold_commits, rehydrate_chat, rehydrate_commit
+from app.services.usage import usage_service
+from app.services.warmup import model_warmer
 from app.models.models import Chat, Commit, Message
-from app.schemas.schemas import ChatResponse, CommitResponse, FetchResponse, CommitHistoryResponse, CommitHistoryItem
+from app.schemas.schemas import ChatResponse, CommitResponse, FetchResponse, ForkResponse, CommitHistoryResponse, CommitHistoryItem
+
+async def resolve_commit_messages(commit: Dict[str, Any], db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """Materialize a commit snapshot, following delta and fork bases"""
+    suffixes = []
+    while commit.get("baseCommitId"):
+        suffixes.append(await cold_commit_messages(commit, db))
+        commit = await db.commits.find_one({"commitId": commit["baseCommitId"], "userId": commit["userId"]})
+        if not commit:
+            raise ValueError("Commit delta base is missing")
+    messages = list(await cold_commit_messages(commit, db))
+    for suffix in reversed(suffixes):
+        messages.extend(suffix)
+    return messages
+
+async def resolve_chat_messages(chat: Dict[str, Any], db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """Full history of a chat; forked chats only store the turns added after the fork"""
+    if not chat.get("baseCommitId"):
+        return chat.get("messages", [])
+    base = chat_cache.fork_base(chat)
+    if base is None:
+        base = await resolve_commit_messages({"baseCommitId": chat["baseCommitId"], "userId": chat["userId"]}, db)
+        chat_cache.remember_fork_base(chat, base)
+    return base + chat.get("messages", [])
+
+async def detach_dependents(commit_ids: List[str], user_id: str, db: AsyncIOMotorDatabase, exclude_chat_id: Optional[str] = None):
+    """Copy shared history into forks and cross-chat deltas that reference commits about to be deleted"""
+    if not commit_ids:
+        return
+    chats = await db.chats.find(
+        {"userId": user_id, "baseCommitId": {"$in": commit_ids}},
+        {"chatId": 1, "userId": 1, "baseCommitId": 1, "tier": 1},
+    ).to_list(None)
+    commits = await db.commits.find(
+        {"userId": user_id, "baseCommitId": {"$in": commit_ids}, "chatId": {"$ne": exclude_chat_id}},
+        {"commitId": 1, "userId": 1, "baseCommitId": 1, "tier": 1},
+    ).to_list(None)
+    if not chats and not commits:
+        return
+
+    bases: Dict[str, List[Dict[str, Any]]] = {}
+    for base_id in {d["baseCommitId"] for d in chats + commits}:
+        bases[base_id] = await resolve_commit_messages({"baseCommitId": base_id, "userId": user_id}, db)
+
+    # Prepend in place so turns appended concurrently are not lost
+    for chat in chats:
+        await rehydrate_chat(chat, db)
+        await db.chats.update_one(
+            {"chatId": chat["chatId"], "userId": user_id, "baseCommitId": chat["baseCommitId"]},
+            {
+                "$push": {"messages": {"$each": bases[chat["baseCommitId"]], "$position": 0}},
+                "$unset": {"baseCommitId": "", "baseCount": ""},
+                "$inc": {"revision": 1},
+            },
+        )
+        chat_cache.invalidate(chat["chatId"], user_id)
+    for commit in commits:
+        await rehydrate_commit(commit, db)
+        await db.commits.update_one(
+            {"commitId": commit["commitId"], "userId": user_id, "baseCommitId": commit["baseCommitId"]},
+            {"$push": {"messages": {"$each": bases[commit["baseCommitId"]], "$position": 0}}, "$unset": {"baseCommitId": ""}},
+        )
+
+class GenerationCancelled(Exception):
+    """Raised when a chat turn is cancelled before the model finished"""
 
 class ChatService:
+    SYSTEM_PROMPT = "You are PromptPilot, an AI-powered development assistant. You help developers with coding, debugging, architecture decisions, and technical questions.\n\n"
+
     def __init__(self):
         self.ollama_model = settings.ollama_model
+        self.router = model_router
         self.ollama_base_url = settings.ollama_base_url
-        
-        # Initialize Ollama LLM
-        self.llm = Ollama(
-            model=self.ollama_model,
-            base_url=self.ollama_base_url,
-            temperature=0.7,
-            top_p=0.9,
-        )
+        self.llm = ollama_client
+        self.llm_options = {"temperature": 0.7, "top_p": 0.9}
+        # In-flight generations on this worker, keyed by (userId, chatId)
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
     
     async def ensure_chat_exists(self, chat_id: str, user_id: str, db: AsyncIOMotorDatabase):
-        chat = await db.chats.find_one({"chatId": chat_id, "userId": user_id})
-        if not chat:
-            await db.chats.insert_one({
-                "chatId": chat_id,
-                "userId": user_id,
-                "name": "Untitled",
-                "messages": [],
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-            })
+        # Single upsert backed by the unique {userId, chatId} index
+        now = datetime.utcnow()
+        try:
+            await db.chats.update_one(
+                {"chatId": chat_id, "userId": user_id},
+                {"$setOnInsert": {
+                    "name": "Untitled",
+                    "messages": [],
+                    "created_at": now,
+                    "updated_at": now,
+                }},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # A concurrent upsert created the chat first
+            pass
+
+    async def next_chat_number(self, user_id: str, db: AsyncIOMotorDatabase) -> int:
+        """Atomically allocate the next per-user chat sequence number"""
+        key = {"_id": f"chats:{user_id}"}
+        counter = await db.counters.find_one_and_update(key, {"$inc": {"seq": 1}}, return_document=ReturnDocument.AFTER)
+        if counter is None:
+            # First allocation for this user: seed past chats created before counters existed.
+            # Only one seed can insert, and every caller then increments the same counter.
+            existing = await db.chats.count_documents({"userId": user_id})
+            try:
+                await db.counters.update_one(key, {"$setOnInsert": {"seq": existing}}, upsert=True)
+            except DuplicateKeyError:
+                # A concurrent first allocation seeded it
+                pass
+            counter = await db.counters.find_one_and_update(key, {"$inc": {"seq": 1}}, return_document=ReturnDocument.AFTER)
+        return counter["seq"]
     
+    async def list_revision(self, user_id: str, db: AsyncIOMotorDatabase) -> Optional[datetime]:
+        """Latest updated_at across the user's chats; any change to the chat list moves it"""
+        query = {"userId": user_id}
+        with stage("chat.list_revision", db.chats, query):
+            latest = await db.chats.find_one(query, {"updated_at": 1, "_id": 0}, sort=[("updated_at", -1)])
+        return latest["updated_at"] if latest else None
+
+    async def messages_revision(self, chat_id: str, user_id: str, db: AsyncIOMotorDatabase) -> Optional[int]:
+        """Counter bumped whenever the chat's messages change (None if the chat does not exist)"""
+        entry = chat_cache.peek(chat_id, user_id)
+        if entry is not None and not chat_cache.shared():
+            return entry.revision
+        query = {"chatId": chat_id, "userId": user_id}
+        with stage("chat.revision", db.chats, query):
+            chat = await db.chats.find_one(query, {"revision": 1, "_id": 0})
+        return chat.get("revision", 0) if chat is not None else None
+
     async def list_chats(self, user_id: str, db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
         cursor = db.chats.find({"userId": user_id}).sort("updated_at", -1)
         items: List[Dict[str, Any]] = []
@@ -60,91 +171,316 @@ class ChatService:
         await db.chats.insert_one(doc)
         return {"chatId": chat_id, "name": doc["name"], "updatedAt": doc["updated_at"]}
 
-    async def get_chat_messages(self, chat_id: str, user_id: str, db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
-        chat = await db.chats.find_one({"chatId": chat_id, "userId": user_id})
+    async def get_chat_messages(
+        self,
+        chat_id: str,
+        user_id: str,
+        db: AsyncIOMotorDatabase,
+        revision: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        query = {"chatId": chat_id, "userId": user_id}
+        with stage("chat.load", db.chats, query):
+            chat = await chat_cache.get(chat_id, user_id, db, revision)
         if not chat:
             return []
-        return chat.get("messages", [])
+        if chat.get("tier"):
+            with stage("chat.rehydrate"):
+                chat = await rehydrate_chat(chat, db)
+        with stage("chat.resolve_history"):
+            return await resolve_chat_messages(chat, db)
 
     async def process_message(
         self, 
         chat_id: str, 
         user_message: str, 
         user_id: str, 
-        db: AsyncIOMotorDatabase
+        db: AsyncIOMotorDatabase,
+        route: Optional[str] = None
     ) -> ChatResponse:
         
-        # Get or create chat
-        await self.ensure_chat_exists(chat_id, user_id, db)
-        chat = await db.chats.find_one({"chatId": chat_id, "userId": user_id})
+        # Get or create chat (a cached chat needs neither the upsert nor a read)
+        query = {"chatId": chat_id, "userId": user_id}
+        with stage("chat.load", db.chats, query):
+            chat = await chat_cache.get(chat_id, user_id, db)
+        if chat is None:
+            with stage("chat.ensure_exists"):
+                await self.ensure_chat_exists(chat_id, user_id, db)
+            with stage("chat.load", db.chats, query):
+                chat = await chat_cache.get(chat_id, user_id, db)
+        if chat.get("tier"):
+            with stage("chat.rehydrate"):
+                chat = await rehydrate_chat(chat, db)
         
-        # Create memory from existing messages
-        memory = ConversationBufferMemory(return_messages=True)
-        for msg in chat.get("messages", []):
-            if msg["role"] == "user":
-                memory.chat_memory.add_user_message(msg["content"])
-            elif msg["role"] == "assistant":
-                memory.chat_memory.add_ai_message(msg["content"])
-        
-        # Add new user message
-        memory.chat_memory.add_user_message(user_message)
+        with stage("chat.resolve_history"):
+            history = await resolve_chat_messages(chat, db)
+        decision = self.router.route(user_message, history, route)
+        chunks: List[str] = []
+        usage: Dict[str, int] = {}
+        started = time.perf_counter()
         
         # Get AI response
         try:
-            conversation_history = memory.chat_memory.messages
-            prompt = self._create_prompt(conversation_history, user_message)
-            ai_response = await self._get_ai_response(prompt)
+            prompt = self._create_prompt(history, user_message)
+            with stage(f"llm.generate.{decision.route}"):
+                ai_response = await self._get_ai_response(prompt, chunks, usage, model=decision.model)
+        except asyncio.CancelledError:
+            if settings.partial_turn_policy == "save":
+                await self._append_turn(chat_id, user_id, user_message, "".join(chunks), db, partial=True, decision=decision)
+            raise
         except Exception as e:
             ai_response = f"I apologize, but I'm having trouble processing your request right now. Error: {str(e)}"
         
-        # Add AI response to memory
-        memory.chat_memory.add_ai_message(ai_response)
-        
-        # Update chat in database
-        updated_messages = []
-        for msg in memory.chat_memory.messages:
-            if isinstance(msg, HumanMessage):
-                updated_messages.append({
-                    "role": "user",
-                    "content": msg.content,
-                    "timestamp": datetime.utcnow()
-                })
-            elif isinstance(msg, AIMessage):
-                updated_messages.append({
-                    "role": "assistant", 
-                    "content": msg.content,
-                    "timestamp": datetime.utcnow()
-                })
+        latency_ms = round((time.perf_counter() - started) * 1000)
+        with stage("chat.append_turn"):
+            now = await self._append_turn(
+                chat_id, user_id, user_message, ai_response, db, usage=usage, decision=decision, latency_ms=latency_ms
+            )
+        if usage:
+            with stage("usage.record"):
+                await usage_service.record(user_id, usage["promptTokens"], usage["completionTokens"], db)
+        return ChatResponse(chatId=chat_id, assistantMessage=ai_response, timestamp=now, model=decision.model, route=decision.route)
+    
+    async def process_message_cancellable(
+        self,
+        chat_id: str,
+        user_message: str,
+        user_id: str,
+        db: AsyncIOMotorDatabase,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        route: Optional[str] = None
+    ) -> ChatResponse:
+        """Run process_message, aborting the generation if the client disconnects or cancel_generation is called"""
+        # Rate limit and quota are enforced before any work reaches the model
+        await usage_service.check(user_id, db)
+        
+        key = (user_id, chat_id)
+        use_shared_flag = settings.shared_state_backend.lower() != "memory"
+        started = time.time()
+        next_shared_check = time.monotonic() + settings.cancel_poll_seconds
         
-        await db.chats.update_one(
-            {"chatId": chat_id, "userId": user_id},
-            {"$set": {"messages": updated_messages, "updated_at": datetime.utcnow()}}
-        )
+        task = asyncio.create_task(self.process_message(chat_id, user_message, user_id, db, route))
+        self._inflight[key] = task
+        try:
+            cancelling = False
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=settings.disconnect_poll_seconds)
+                if done:
+                    break
+                if cancelling:
+                    # Let the task finish saving any partial turn
+                    continue
+                if is_disconnected is not None and await is_disconnected():
+                    cancelling = task.cancel()
+                elif use_shared_flag and time.monotonic() >= next_shared_check:
+                    # Cancels that reached another worker are rare: check the shared flag less often
+                    next_shared_check = time.monotonic() + settings.cancel_poll_seconds
+                    requested_at = await shared_state.get(self._cancel_key(user_id, chat_id))
+                    # The flag holds the cancel's wall-clock time; older flags were meant for an earlier turn
+                    if requested_at is not None and float(requested_at) >= started:
+                        cancelling = task.cancel()
+            if task.cancelled():
+                raise GenerationCancelled("Generation was cancelled")
+            return task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+    
+    async def cancel_generation(self, chat_id: str, user_id: str) -> bool:
+        """Cancel the in-flight generation for a chat; returns whether one was found on this worker"""
+        task = self._inflight.get((user_id, chat_id))
+        if task is not None and not task.done():
+            # Drop the registration so a repeated cancel cannot interrupt saving a partial turn
+            del self._inflight[(user_id, chat_id)]
+            task.cancel()
+            return True
+        if settings.shared_state_backend.lower() != "memory":
+            await shared_state.set(self._cancel_key(user_id, chat_id), str(time.time()), settings.cancel_poll_seconds * 3)
+        return False
+    
+    def _cancel_key(self, user_id: str, chat_id: str) -> str:
+        return f"cancel:{user_id}:{chat_id}"
+    
+    async def prepare_fanout(
+        self,
+        user_message: str,
+        user_id: str,
+        db: AsyncIOMotorDatabase,
+        commit_ids: List[str],
+        chat_id: Optional[str] = None,
+        models: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Resolve every (context, model) target of a fan-out up front, so bad ids fail before streaming"""
+        contexts: List[Dict[str, Any]] = []
+        for commit_id in dict.fromkeys(commit_ids):
+            query = {"commitId": commit_id, "userId": user_id}
+            with stage("fanout.load_commit", db.commits, query):
+                commit = await db.commits.find_one(query)
+            if not commit:
+                raise ValueError(f"Commit {commit_id} not found")
+            contexts.append({"commitId": commit_id, "history": await resolve_commit_messages(commit, db)})
+        if chat_id is not None:
+            query = {"chatId": chat_id, "userId": user_id}
+            with stage("fanout.load_chat", db.chats, query):
+                chat = await chat_cache.get(chat_id, user_id, db)
+            if not chat:
+                raise ValueError(f"Chat {chat_id} not found")
+            if chat.get("tier"):
+                chat = await rehydrate_chat(chat, db)
+            contexts.append({"chatId": chat_id, "history": await resolve_chat_messages(chat, db)})
         
-        return ChatResponse(chatId=chat_id, assistantMessage=ai_response, timestamp=datetime.utcnow())
+        decisions = [self.router.for_model(m) for m in dict.fromkeys(models or [])]
+        targets = []
+        for context in contexts:
+            for decision in decisions or [self.router.route(user_message, context["history"])]:
+                targets.append({**context, "decision": decision})
+        # Each generation takes a rate-limit token, so a fan-out larger than the burst could never start
+        limit = settings.fanout_max_targets
+        if settings.rate_limit_turns_per_minute > 0:
+            limit = min(limit, settings.rate_limit_burst)
+        if len(targets) > limit:
+            raise ValueError(f"Fan-out of {len(targets)} generations exceeds the limit of {limit}")
+        return targets
     
-    def _create_prompt(self, conversation_history: List, user_message: str) -> str:
-        prompt = "You are PromptPilot, an AI-powered development assistant. You help developers with coding, debugging, architecture decisions, and technical questions.\n\n"
+    async def run_fanout(
+        self,
+        targets: List[Dict[str, Any]],
+        user_message: str,
+        user_id: str,
+        db: AsyncIOMotorDatabase
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Generate every target concurrently (each waits for an LLM slot) and yield results as they
+        complete. Nothing is written to chats or commits; closing the iterator cancels the rest."""
+        
+        async def generate(index: int, target: Dict[str, Any]) -> Dict[str, Any]:
+            decision = target["decision"]
+            result = {"index": index, "commitId": target.get("commitId"), "chatId": target.get("chatId"),
+                      "model": decision.model, "route": decision.route}
+            usage: Dict[str, int] = {}
+            started = time.perf_counter()
+            try:
+                prompt = self._create_prompt(target["history"], user_message)
+                result["response"] = await self._get_ai_response(prompt, usage=usage, model=decision.model)
+            except Exception as e:
+                result["error"] = str(e)
+            result["latencyMs"] = round((time.perf_counter() - started) * 1000)
+            if usage:
+                result["usage"] = usage
+                await usage_service.record(user_id, usage["promptTokens"], usage["completionTokens"], db)
+            return result
+        
+        tasks = [asyncio.create_task(generate(i, t)) for i, t in enumerate(targets)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _append_turn(
+        self,
+        chat_id: str,
+        user_id: str,
+        user_message: str,
+        assistant_message: str,
+        db: AsyncIOMotorDatabase,
+        partial: bool = False,
+        usage: Optional[Dict[str, int]] = None,
+        decision: Optional[RouteDecision] = None,
+        latency_ms: Optional[int] = None
+    ) -> datetime:
+        # Append the new turn; earlier messages are left untouched. BSON keeps milliseconds,
+        # so truncate to match what a cached copy and a fresh read return
+        now = datetime.utcnow()
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        assistant = {"role": "assistant", "content": assistant_message, "timestamp": now}
+        if partial:
+            assistant["partial"] = True
+        if decision is not None:
+            assistant["model"] = decision.model
+            assistant["route"] = decision.route
+        if latency_ms is not None:
+            assistant["latencyMs"] = latency_ms
+        update: Dict[str, Any] = {
+            "$push": {"messages": {"$each": [
+                {"role": "user", "content": user_message, "timestamp": now},
+                assistant,
+            ]}},
+            "$set": {"updated_at": now},
+            "$inc": {"revision": 1},
+        }
+        if usage:
+            # Per-turn counts on the message, running per-chat totals on the chat
+            assistant["usage"] = usage
+            update["$inc"].update({
+                "usage.promptTokens": usage["promptTokens"],
+                "usage.completionTokens": usage["completionTokens"],
+                "usage.turns": 1,
+            })
+        query = {"chatId": chat_id, "userId": user_id}
+        entry = chat_cache.peek(chat_id, user_id)
+        if entry is not None:
+            # Write-through, guarded on the cached revision
+            result = await db.chats.update_one({**query, "revision": revision_filter(entry.revision)}, update)
+            if result.matched_count:
+                fields: Dict[str, Any] = {"updated_at": now}
+                if usage:
+                    totals = dict(entry.doc.get("usage") or {})
+                    totals["promptTokens"] = totals.get("promptTokens", 0) + usage["promptTokens"]
+                    totals["completionTokens"] = totals.get("completionTokens", 0) + usage["completionTokens"]
+                    totals["turns"] = totals.get("turns", 0) + 1
+                    fields["usage"] = totals
+                chat_cache.appended(chat_id, user_id, update["$push"]["messages"]["$each"], fields)
+                return now
+            # Changed elsewhere since it was cached: appends commute, so apply unguarded
+            chat_cache.invalidate(chat_id, user_id)
+        await db.chats.update_one(query, update)
+        return now
+    
+    def _create_prompt(self, conversation_history: List[Dict[str, Any]], user_message: str) -> str:
+        parts = [self.SYSTEM_PROMPT]
         if conversation_history:
-            prompt += "Previous conversation:\n"
-            for msg in conversation_history[:-1]:
-                if isinstance(msg, HumanMessage):
-                    prompt += f"Human: {msg.content}\n"
-                elif isinstance(msg, AIMessage):
-                    prompt += f"Assistant: {msg.content}\n"
-            prompt += "\n"
-        prompt += f"Human: {user_message}\n"
-        prompt += "Assistant: "
-        return prompt
+            parts.append("Previous conversation:\n")
+            for msg in conversation_history:
+                if msg["role"] == "user":
+                    parts.append(f"Human: {msg['content']}\n")
+                elif msg["role"] == "assistant":
+                    parts.append(f"Assistant: {msg['content']}\n")
+            parts.append("\n")
+        parts.append(f"Human: {user_message}\n")
+        parts.append("Assistant: ")
+        return "".join(parts)
     
-    async def _get_ai_response(self, prompt: str) -> str:
+    async def _get_ai_response(
+        self,
+        prompt: str,
+        chunks: Optional[List[str]] = None,
+        usage: Optional[Dict[str, int]] = None,
+        model: Optional[str] = None
+    ) -> str:
+        """Stream the completion, collecting text into `chunks` so a cancelled turn can keep its partial
+        output, and Ollama's token counts from the final chunk into `usage`"""
+        chunks = chunks if chunks is not None else []
         try:
-            response = self.llm.invoke(prompt)
-            return response.strip()
+            async with llm_gate.slot():
+                async with aclosing(self.llm.stream_generate(model or self.ollama_model, prompt, self.llm_options)) as stream:
+                    async for chunk in stream:
+                        chunks.append(chunk.get("response", ""))
+                        if chunk.get("done") and usage is not None:
+                            usage["promptTokens"] = chunk.get("prompt_eval_count", 0)
+                            usage["completionTokens"] = chunk.get("eval_count", 0)
+            model_warmer.mark_used(model or self.ollama_model)
+            return "".join(chunks).strip()
         except Exception as e:
             return f"I apologize, but I encountered an error while processing your request: {str(e)}"
 
 class CommitService:
+    async def resolve_commit_messages(self, commit: Dict[str, Any], db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+        """Materialize a commit snapshot, following delta bases written by compaction"""
+        return await resolve_commit_messages(commit, db)
+
     async def create_commit(
         self,
         chat_id: str,
@@ -153,9 +489,14 @@ class CommitService:
         db: AsyncIOMotorDatabase
     ) -> CommitResponse:
         # Get current chat
-        chat = await db.chats.find_one({"chatId": chat_id, "userId": user_id})
+        query = {"chatId": chat_id, "userId": user_id}
+        with stage("chat.load", db.chats, query):
+            chat = await chat_cache.get(chat_id, user_id, db)
         if not chat:
             raise ValueError(f"Chat {chat_id} not found")
+        if chat.get("tier"):
+            with stage("chat.rehydrate"):
+                chat = await rehydrate_chat(chat, db)
         
         commit_id = str(uuid.uuid4())
         commit_doc = {
@@ -164,16 +505,22 @@ class CommitService:
             "userId": user_id,
             "name": name,
             "messages": chat["messages"],
+            "messageCount": chat.get("baseCount", 0) + len(chat["messages"]),
             "timestamp": datetime.utcnow()
         }
-        await db.commits.insert_one(commit_doc)
+        if chat.get("baseCommitId"):
+            # Forked chat: the commit shares the fork's base instead of copying it
+            commit_doc["baseCommitId"] = chat["baseCommitId"]
+        with stage("commit.insert"):
+            await db.commits.insert_one(commit_doc)
+            await db.chats.update_one(query, {"$inc": {"commitRevision": 1}})
         
         return CommitResponse(
             commitId=commit_id,
             chatId=chat_id,
             name=name,
             timestamp=commit_doc["timestamp"],
-            messageCount=len(chat["messages"])
+            messageCount=commit_doc["messageCount"]
         )
     
     async def fetch_commit(
@@ -182,28 +529,101 @@ class CommitService:
         user_id: str,
         db: AsyncIOMotorDatabase
     ) -> FetchResponse:
-        commit = await db.commits.find_one({"commitId": commit_id, "userId": user_id})
+        query = {"commitId": commit_id, "userId": user_id}
+        with stage("commit.load", db.commits, query):
+            commit = await db.commits.find_one(query)
         if not commit:
             raise ValueError(f"Commit {commit_id} not found")
+        if commit.get("tier"):
+            with stage("commit.rehydrate"):
+                commit = await rehydrate_commit(commit, db)
         
         chat_id = commit["chatId"]
         commit_timestamp = commit["timestamp"]
-        await db.commits.delete_many({"chatId": chat_id, "userId": user_id, "timestamp": {"$gt": commit_timestamp}})
-        await db.chats.update_one(
-            {"chatId": chat_id, "userId": user_id},
-            {"$set": {"messages": commit["messages"], "updated_at": datetime.utcnow()}}
-        )
+        with stage("commit.resolve"):
+            messages = await self.resolve_commit_messages(commit, db)
+        
+        later = {"chatId": chat_id, "userId": user_id, "timestamp": {"$gt": commit_timestamp}}
+        with stage("commit.drop_later", db.commits, later):
+            later_ids = await db.commits.distinct("commitId", later)
+            await detach_dependents(later_ids, user_id, db, exclude_chat_id=chat_id)
+            await db.commits.delete_many(later)
+            await discard_cold_commits(later_ids, user_id, db)
+        with stage("chat.restore"):
+            await db.chats.update_one(
+                {"chatId": chat_id, "userId": user_id},
+                {
+                    "$set": {"messages": messages, "updated_at": datetime.utcnow()},
+                    "$unset": {"baseCommitId": "", "baseCount": "", "tier": ""},
+                    "$inc": {"revision": 1, "commitRevision": 1},
+                }
+            )
+            chat_cache.invalidate(chat_id, user_id)
+            await discard_cold_chat(chat_id, user_id, db)
+        
+        # Restored messages were written by us; don't validate every message again
+        return FetchResponse.model_construct(commitId=commit_id, chatId=chat_id, restoredMessages=messages, timestamp=datetime.utcnow())
+    
+    async def fork_commit(
+        self,
+        commit_id: str,
+        user_id: str,
+        db: AsyncIOMotorDatabase,
+        name: Optional[str] = None
+    ) -> ForkResponse:
+        """Create a new chat that shares the commit's history by reference (copy-on-write)"""
+        commit = await db.commits.find_one({"commitId": commit_id, "userId": user_id}, {"messages": 0})
+        if not commit:
+            raise ValueError(f"Commit {commit_id} not found")
+        message_count = commit.get("messageCount")
+        if message_count is None:
+            # Commit written before messageCount existed
+            message_count = len(await self.resolve_commit_messages(await db.commits.find_one({"_id": commit["_id"], "userId": user_id}), db))
         
-        return FetchResponse(commitId=commit_id, chatId=chat_id, restoredMessages=commit["messages"], timestamp=datetime.utcnow())
+        now = datetime.utcnow()
+        doc = {
+            "chatId": str(uuid.uuid4()),
+            "userId": user_id,
+            "name": name or f"Fork of {commit['name']}",
+            "messages": [],
+            "baseCommitId": commit_id,
+            "baseCount": message_count,
+            "forkedFromChatId": commit["chatId"],
+            "created_at": now,
+            "updated_at": now,
+        }
+        await db.chats.insert_one(doc)
+        
+        return ForkResponse(
+            chatId=doc["chatId"],
+            name=doc["name"],
+            forkedFromCommitId=commit_id,
+            forkedFromChatId=commit["chatId"],
+            messageCount=message_count,
+            updatedAt=now
+        )
     
+    async def history_revision(self, chat_id: str, user_id: str, db: AsyncIOMotorDatabase) -> Optional[int]:
+        """Counter bumped whenever the chat's commit list changes (None if the chat does not exist)"""
+        query = {"chatId": chat_id, "userId": user_id}
+        with stage("commit.history_revision", db.chats, query):
+            chat = await db.chats.find_one(query, {"commitRevision": 1, "_id": 0})
+        return chat.get("commitRevision", 0) if chat is not None else None
+
     async def get_commit_history(
         self,
         chat_id: str,
         user_id: str,
         db: AsyncIOMotorDatabase
     ) -> CommitHistoryResponse:
-        commits_cursor = db.commits.find({"chatId": chat_id, "userId": user_id}).sort("timestamp", -1)
+        query = {"chatId": chat_id, "userId": user_id}
+        commits_cursor = db.commits.find(query).sort("timestamp", -1)
         commits = []
-        async for commit in commits_cursor:
-            commits.append(CommitHistoryItem(commitId=commit["commitId"], name=commit["name"], timestamp=commit["timestamp"], messageCount=len(commit["messages"])) )
+        with stage("commit.history", db.commits, query):
+            async for commit in commits_cursor:
+                message_count = commit.get("messageCount")
+                if message_count is None:
+                    # Written before messageCount existed (a full snapshot, possibly demoted already)
+                    message_count = len(await cold_commit_messages(commit, db))
+                commits.append(CommitHistoryItem(commitId=commit["commitId"], name=commit["name"], timestamp=commit["timestamp"], messageCount=message_count))
         return CommitHistoryResponse(chatId=chat_id, commits=commits, totalCount=len(commits))
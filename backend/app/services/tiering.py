@@ -0,0 +1,191 @@
+import asyncio
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import Binary, decode as bson_decode, encode as bson_encode
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import settings
+from app.services.chat_cache import chat_cache
+
+COLD = "cold"
+
+# Cold entries are keyed by _id, and filters also carry userId so they target one shard
+def _chat_key(user_id: str, chat_id: str) -> Dict[str, str]:
+    return {"_id": f"chat:{user_id}:{chat_id}", "userId": user_id}
+
+def _commit_key(user_id: str, commit_id: str) -> Dict[str, str]:
+    return {"_id": f"commit:{user_id}:{commit_id}", "userId": user_id}
+
+def _pack(messages: List[Dict[str, Any]]) -> Binary:
+    return Binary(zlib.compress(bson_encode({"messages": messages}), settings.tiering_compression_level))
+
+def _unpack(blob: bytes) -> List[Dict[str, Any]]:
+    return bson_decode(zlib.decompress(blob))["messages"]
+
+async def _load_cold(key: Dict[str, str], db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    doc = await db.cold_storage.find_one(key)
+    if not doc:
+        raise ValueError(f"Cold storage entry {key['_id']} is missing")
+    return _unpack(doc["blob"])
+
+async def cold_commit_messages(commit: Dict[str, Any], db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """Stored messages of a commit, reading through to cold storage when it has been demoted"""
+    if commit.get("tier") != COLD:
+        return commit.get("messages", [])
+    return await _load_cold(_commit_key(commit["userId"], commit["commitId"]), db)
+
+async def rehydrate_chat(chat: Dict[str, Any], db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    """Move a cold chat's messages back into the chats collection; returns the hot document"""
+    if chat.get("tier") != COLD:
+        return chat
+    key = _chat_key(chat["userId"], chat["chatId"])
+    cold = await db.cold_storage.find_one(key)
+    if cold:
+        # Only the caller that still sees the chat as cold restores it
+        await db.chats.update_one(
+            {"chatId": chat["chatId"], "userId": chat["userId"], "tier": COLD},
+            {"$push": {"messages": {"$each": _unpack(cold["blob"]), "$position": 0}}, "$unset": {"tier": ""}},
+        )
+        await db.cold_storage.delete_one(key)
+    hot = await db.chats.find_one({"chatId": chat["chatId"], "userId": chat["userId"]})
+    if hot is not None:
+        chat_cache.put(hot)
+    return hot
+
+async def rehydrate_commit(commit: Dict[str, Any], db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    if commit.get("tier") != COLD:
+        return commit
+    key = _commit_key(commit["userId"], commit["commitId"])
+    cold = await db.cold_storage.find_one(key)
+    if cold:
+        await db.commits.update_one(
+            {"commitId": commit["commitId"], "userId": commit["userId"], "tier": COLD},
+            {"$set": {"messages": _unpack(cold["blob"])}, "$unset": {"tier": ""}},
+        )
+        await db.cold_storage.delete_one(key)
+    return await db.commits.find_one({"commitId": commit["commitId"], "userId": commit["userId"]})
+
+async def discard_cold_chat(chat_id: str, user_id: str, db: AsyncIOMotorDatabase):
+    """Drop a chat's cold copy after its messages were replaced wholesale"""
+    await db.cold_storage.delete_one(_chat_key(user_id, chat_id))
+
+async def discard_cold_commits(commit_ids: List[str], user_id: str, db: AsyncIOMotorDatabase):
+    """Drop cold copies of commits that are being deleted"""
+    if commit_ids:
+        await db.cold_storage.delete_many({"_id": {"$in": [_commit_key(user_id, c)["_id"] for c in commit_ids]}, "userId": user_id})
+
+class TieringService:
+    """Demotes idle chats and old commits to compressed cold storage"""
+
+    def __init__(self):
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    async def demote_chat(self, chat: Dict[str, Any], db: AsyncIOMotorDatabase) -> int:
+        """Returns bytes moved out of the chats collection (0 if the chat changed meanwhile)"""
+        messages = chat.get("messages", [])
+        if not messages:
+            return 0
+        key = _chat_key(chat["userId"], chat["chatId"])
+        blob = _pack(messages)
+        await db.cold_storage.update_one(
+            key,
+            {"$set": {"blob": blob, "kind": "chat", "movedAt": datetime.utcnow()}},
+            upsert=True,
+        )
+        # Guarded on updated_at so a turn appended since we read the chat keeps it hot;
+        # the revision bump makes every worker drop its cached copy
+        result = await db.chats.update_one(
+            {"chatId": chat["chatId"], "userId": chat["userId"], "updated_at": chat["updated_at"], "tier": {"$exists": False}},
+            {"$set": {"messages": [], "tier": COLD}, "$inc": {"revision": 1}},
+        )
+        chat_cache.invalidate(chat["chatId"], chat["userId"])
+        if result.modified_count == 0:
+            await db.cold_storage.delete_one(key)
+            return 0
+        return max(len(bson_encode({"messages": messages})) - len(blob), 0)
+
+    async def demote_commit(self, commit: Dict[str, Any], db: AsyncIOMotorDatabase) -> int:
+        messages = commit.get("messages", [])
+        if not messages:
+            return 0
+        key = _commit_key(commit["userId"], commit["commitId"])
+        blob = _pack(messages)
+        await db.cold_storage.update_one(
+            key,
+            {"$set": {"blob": blob, "kind": "commit", "movedAt": datetime.utcnow()}},
+            upsert=True,
+        )
+        update: Dict[str, Any] = {"messages": [], "tier": COLD}
+        if "messageCount" not in commit:
+            # Commits from before messageCount are full snapshots; history can no longer count them
+            update["messageCount"] = len(messages)
+        # Commits only change when retention rewrites them, which always moves baseCommitId;
+        # guard on it so a rewrite since we read the commit is not overwritten by a stale blob
+        result = await db.commits.update_one(
+            {
+                "commitId": commit["commitId"],
+                "userId": commit["userId"],
+                "baseCommitId": commit.get("baseCommitId"),
+                "tier": {"$exists": False},
+            },
+            {"$set": update},
+        )
+        if result.modified_count == 0:
+            await db.cold_storage.delete_one(key)
+            return 0
+        return max(len(bson_encode({"messages": messages})) - len(blob), 0)
+
+    async def _demote_batches(self, collection, query: Dict[str, Any], demote, db: AsyncIOMotorDatabase) -> Dict[str, int]:
+        moved, saved = 0, 0
+        last_id = None
+        batch_size = max(settings.tiering_batch_size, 1)
+        while True:
+            page = dict(query)
+            if last_id is not None:
+                page["_id"] = {"$gt": last_id}
+            docs = await collection.find(page).sort("_id", 1).limit(batch_size).to_list(None)
+            if not docs:
+                break
+            for doc in docs:
+                bytes_saved = await demote(doc, db)
+                if bytes_saved:
+                    moved += 1
+                    saved += bytes_saved
+            last_id = docs[-1]["_id"]
+            # Yield to live traffic between batches
+            await asyncio.sleep(settings.tiering_batch_pause_ms / 1000)
+        return {"moved": moved, "bytes": saved}
+
+    async def run_once(self, db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        chats = await self._demote_batches(
+            db.chats,
+            {"updated_at": {"$lt": now - timedelta(days=settings.tiering_chat_idle_days)}, "tier": {"$exists": False}},
+            self.demote_chat,
+            db,
+        )
+        commits = await self._demote_batches(
+            db.commits,
+            {"timestamp": {"$lt": now - timedelta(days=settings.tiering_commit_idle_days)}, "tier": {"$exists": False}},
+            self.demote_commit,
+            db,
+        )
+        report = {
+            "startedAt": now,
+            "chatsDemoted": chats["moved"],
+            "commitsDemoted": commits["moved"],
+            "bytesSaved": chats["bytes"] + commits["bytes"],
+            "durationSeconds": round(time.perf_counter() - started, 3),
+        }
+        self.last_report = report
+        print(
+            f"🧊 Tiering pass: {report['chatsDemoted']} chats and {report['commitsDemoted']} commits moved to cold storage, "
+            f"{report['bytesSaved'] / 1024:.1f} KB saved"
+        )
+        return report
+
+tiering_service = TieringService()
@@ -0,0 +1,162 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import settings
+from app.core.shared_state import shared_state
+
+class QuotaExceeded(Exception):
+    """Raised when a user is over their rate limit or daily token quota"""
+
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # Shared window this user was last found over the limit in (see UsageService._take)
+        self.full_window = -1
+
+    def take(self, count: int = 1) -> float:
+        """Take `count` tokens at once; returns 0 on success, otherwise seconds until that many are available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+        if self.tokens >= count:
+            self.tokens -= count
+            return 0.0
+        return (count - self.tokens) / self.refill_per_second
+
+    def refund(self, count: int):
+        self.tokens = min(self.capacity, self.tokens + count)
+
+@dataclass
+class _DailyUsage:
+    day: str
+    tokens: int
+    fetched_at: float
+
+def _today() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+def _seconds_until_midnight() -> float:
+    now = datetime.utcnow()
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - now).total_seconds()
+
+class UsageService:
+    """Per-user token accounting, turn rate limiting and daily token quotas.
+
+    Every worker checks an in-process token bucket per user first. With a
+    shared SHARED_STATE_BACKEND, turns that pass it also take from a counter
+    per user and fixed window there, so the limit holds across workers: each
+    window lasts as long as refilling a full burst takes and admits
+    RATE_LIMIT_BURST turns, which keeps the same sustained rate (at most two
+    bursts can meet at a window boundary). Only admitted turns touch the
+    shared counter; once a window is full, the worker rejects that user
+    locally until it ends. Daily usage is read from Mongo at most once per
+    `usage_refresh_seconds` per user and worker and kept current locally, so
+    quota checks do not add a round trip per request; the daily quota
+    converges across workers on each refresh.
+    """
+
+    max_tracked_users = 10000
+
+    def __init__(self):
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._daily: "OrderedDict[str, _DailyUsage]" = OrderedDict()
+
+    def _bucket(self, user_id: str) -> TokenBucket:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(settings.rate_limit_burst, settings.rate_limit_turns_per_minute / 60)
+            self._buckets[user_id] = bucket
+            if len(self._buckets) > self.max_tracked_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+        return bucket
+
+    async def _take(self, user_id: str, turns: int) -> float:
+        """Take `turns` rate-limit tokens (all or none); returns 0 on success, otherwise seconds to wait"""
+        bucket = self._bucket(user_id)
+        wait = bucket.take(turns)
+        if wait > 0 or settings.shared_state_backend.lower() == "memory":
+            return wait
+        burst = max(settings.rate_limit_burst, 1)
+        window = 60 * burst / settings.rate_limit_turns_per_minute
+        now = time.time()
+        index = int(now // window)
+        if bucket.full_window != index:
+            key = f"ratelimit:{user_id}:{index}"
+            used = await shared_state.incr(key, turns, window * 2)
+            if used <= burst:
+                return 0.0
+            # Rejected turns do not count against the window
+            await shared_state.incr(key, -turns, window * 2)
+            bucket.full_window = index
+        bucket.refund(turns)
+        return (index + 1) * window - now
+
+    async def _daily_usage(self, user_id: str, db: AsyncIOMotorDatabase) -> _DailyUsage:
+        day = _today()
+        entry = self._daily.get(user_id)
+        if entry is None or entry.day != day or time.monotonic() - entry.fetched_at > settings.usage_refresh_seconds:
+            doc = await db.usage.find_one({"_id": f"{user_id}:{day}", "userId": user_id}, {"promptTokens": 1, "completionTokens": 1})
+            tokens = (doc.get("promptTokens", 0) + doc.get("completionTokens", 0)) if doc else 0
+            entry = _DailyUsage(day, tokens, time.monotonic())
+            self._daily[user_id] = entry
+            if len(self._daily) > self.max_tracked_users:
+                self._daily.popitem(last=False)
+        else:
+            self._daily.move_to_end(user_id)
+        return entry
+
+    async def check(self, user_id: str, db: AsyncIOMotorDatabase, turns: int = 1):
+        """Raise QuotaExceeded if the user may not start `turns` more generations now (all or none)"""
+        if settings.rate_limit_turns_per_minute > 0:
+            wait = await self._take(user_id, turns)
+            if wait > 0:
+                raise QuotaExceeded("Rate limit exceeded, slow down", wait)
+        if settings.daily_token_quota > 0:
+            usage = await self._daily_usage(user_id, db)
+            if usage.tokens >= settings.daily_token_quota:
+                raise QuotaExceeded("Daily token quota exceeded", _seconds_until_midnight())
+
+    async def record(self, user_id: str, prompt_tokens: int, completion_tokens: int, db: AsyncIOMotorDatabase):
+        """Add a turn's token counts to the user's daily counters"""
+        day = _today()
+        await db.usage.update_one(
+            {"_id": f"{user_id}:{day}", "userId": user_id},
+            {
+                "$inc": {"promptTokens": prompt_tokens, "completionTokens": completion_tokens, "turns": 1},
+                "$setOnInsert": {"day": day},
+            },
+            upsert=True,
+        )
+        entry = self._daily.get(user_id)
+        if entry is not None and entry.day == day:
+            entry.tokens += prompt_tokens + completion_tokens
+
+    async def get_usage(self, user_id: str, db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+        day = _today()
+        doc = await db.usage.find_one({"_id": f"{user_id}:{day}", "userId": user_id}) or {}
+        used = doc.get("promptTokens", 0) + doc.get("completionTokens", 0)
+        return {
+            "day": day,
+            "promptTokens": doc.get("promptTokens", 0),
+            "completionTokens": doc.get("completionTokens", 0),
+            "turns": doc.get("turns", 0),
+            "dailyQuota": settings.daily_token_quota or None,
+            "remaining": max(settings.daily_token_quota - used, 0) if settings.daily_token_quota else None,
+        }
+
+usage_service = UsageService()
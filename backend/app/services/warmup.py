@@ -0,0 +1,129 @@
+import asyncio
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.services.llm import OllamaClient, ollama_client
+
+# Model load states
+COLD = "cold"
+LOADING = "loading"
+WARM = "warm"
+ERROR = "error"
+
+def _tagged(model: str) -> str:
+    # /api/ps reports "llama3:latest" for a model configured as "llama3"
+    return model if ":" in model else f"{model}:latest"
+
+class ModelWarmer:
+    """Preloads the routed models and keeps them resident in Ollama.
+
+    On startup every model is loaded with OLLAMA_KEEP_ALIVE. Every
+    MODEL_WARMUP_CHECK_SECONDS the worker asks Ollama which models are
+    resident and reloads any that were evicted, as long as they were used
+    (or the worker started) within MODEL_KEEP_WARM_SECONDS. After that Ollama
+    is left to unload them on its own keep-alive timer.
+    """
+
+    def __init__(self, client: OllamaClient):
+        self.client = client
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self._loads: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, models: Iterable[str]):
+        if not settings.model_warmup_enabled or self._task is not None:
+            return
+        now = time.monotonic()
+        for model in dict.fromkeys(models):
+            self.models[model] = {"state": COLD, "lastUsed": now, "loadSeconds": None, "error": None}
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = [t for t in (self._task, *self._loads.values()) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._loads.clear()
+
+    def is_ready(self, model: str) -> bool:
+        """False only while a tracked model is known not to be resident"""
+        entry = self.models.get(model)
+        return entry is None or entry["state"] == WARM
+
+    def want(self, model: str):
+        """Note demand for a model, starting a load if it has gone cold"""
+        entry = self.models.get(model)
+        if entry is None:
+            return
+        entry["lastUsed"] = time.monotonic()
+        if entry["state"] == COLD and self._task is not None:
+            self._ensure_loading(model)
+
+    def mark_used(self, model: str):
+        entry = self.models.get(model)
+        if entry is not None:
+            entry["lastUsed"] = time.monotonic()
+            # A completed generation means Ollama has the model loaded
+            entry["state"] = WARM
+
+    def _ensure_loading(self, model: str):
+        if model not in self._loads:
+            self._loads[model] = asyncio.create_task(self._load(model))
+
+    async def _load(self, model: str):
+        entry = self.models[model]
+        entry["state"] = LOADING
+        started = time.perf_counter()
+        try:
+            await self.client.load(model, settings.ollama_keep_alive)
+            entry.update(state=WARM, loadSeconds=round(time.perf_counter() - started, 2), error=None)
+            print(f"🔥 Model {model} warm in {entry['loadSeconds']}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            entry.update(state=ERROR, error=str(e))
+            print(f"❌ Failed to warm model {model}: {e}")
+        finally:
+            self._loads.pop(model, None)
+
+    async def _run(self):
+        for model in self.models:
+            self._ensure_loading(model)
+        while True:
+            await asyncio.sleep(settings.model_warmup_check_seconds)
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Model keep-alive check failed: {e}")
+
+    async def check(self):
+        resident = set(await self.client.loaded_models())
+        now = time.monotonic()
+        for model, entry in self.models.items():
+            if model in self._loads:
+                continue
+            if _tagged(model) in resident:
+                entry["state"] = WARM
+                continue
+            entry["state"] = COLD
+            if now - entry["lastUsed"] < settings.model_keep_warm_seconds:
+                self._ensure_loading(model)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "model": model,
+                "state": entry["state"],
+                "idleSeconds": round(now - entry["lastUsed"]),
+                "loadSeconds": entry["loadSeconds"],
+                "error": entry["error"],
+            }
+            for model, entry in self.models.items()
+        ]
+
+model_warmer = ModelWarmer(ollama_client)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Cancellation benchmark for PromptPilot Backend
+
+Runs chat generations against the fake Ollama server, cancels them part way
+through and reports how quickly the server-side slot is released. Does not need
+MongoDB or Ollama. Run from the backend directory:
+
+    python benchmarks/bench_cancellation.py --generations 20 --cancel-after 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_ollama import FakeOllama
+from app.services.llm import OllamaClient
+from app.services.services import ChatService
+
+async def run(generations: int, cancel_after: float):
+    fake = FakeOllama(tokens=500, token_interval=0.01)
+    await fake.start()
+    service = ChatService()
+    service.llm = OllamaClient(fake.base_url, timeout=30)
+
+    tasks = [asyncio.create_task(service._get_ai_response("Human: hi\nAssistant: ")) for _ in range(generations)]
+    await asyncio.sleep(cancel_after)
+    busy = fake.active
+    cancelled_at = time.perf_counter()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Wait for the fake server to notice every dropped connection
+    while fake.active and time.perf_counter() - cancelled_at < 5:
+        await asyncio.sleep(0.001)
+    freed_after = time.perf_counter() - cancelled_at
+    full_duration = fake.tokens * fake.token_interval
+
+    print(f"slots busy before cancel   {busy}")
+    print(f"slots busy after cancel    {fake.active}")
+    print(f"aborted / completed        {fake.aborted} / {fake.completed}")
+    print(f"slots freed after          {freed_after * 1000:.1f} ms (full generation takes {full_duration * 1000:.0f} ms)")
+
+    await service.llm.close()
+    await fake.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--generations", type=int, default=20)
+    parser.add_argument("--cancel-after", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print("🚀 Cancellation benchmark")
+    print("=" * 40)
+    asyncio.run(run(args.generations, args.cancel_after))
+
+if __name__ == "__main__":
+    main()
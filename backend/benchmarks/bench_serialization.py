@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Serialization micro-benchmark for message-heavy responses
+
+Compares FastAPI's default path (response_model validation + jsonable_encoder +
+json.dumps) with the orjson path used by GET /chat/{chat_id}/messages and
+POST /commits/fetch/{commit_id}. Needs no services. Run from the backend directory:
+
+    python benchmarks/bench_serialization.py --counts 10 100 1000 10000
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+
+from app.schemas.schemas import FetchResponse
+
+def make_messages(count: int):
+    now = datetime.utcnow()
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " + "lorem ipsum " * 20, "timestamp": now}
+        for i in range(count)
+    ]
+
+def default_path(messages):
+    response = FetchResponse(commitId="c", chatId="x", restoredMessages=messages)
+    validated = FetchResponse.model_validate(response.model_dump())  # response_model round trip
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode()
+
+def fast_path(messages):
+    response = FetchResponse.model_construct(commitId="c", chatId="x", restoredMessages=messages, timestamp=datetime.utcnow())
+    return ORJSONResponse(response.model_dump()).body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    print("🚀 Serialization benchmark")
+    print("=" * 40)
+    print(f"{'messages':>9} {'default ms':>12} {'orjson ms':>12} {'speedup':>8}")
+    for count in args.counts:
+        messages = make_messages(count)
+        number = max(1, 2000 // count)
+        default = min(timeit.repeat(lambda: default_path(messages), number=number, repeat=3)) / number
+        fast = min(timeit.repeat(lambda: fast_path(messages), number=number, repeat=3)) / number
+        print(f"{count:>9} {default * 1000:>12.3f} {fast * 1000:>12.3f} {default / fast:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
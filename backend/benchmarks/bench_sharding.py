@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Sharding check for PromptPilot Backend
+
+Without arguments, shows how synthetic users spread across N deployments and
+how many move when one more is added. With --urls, connects to several local
+mongod stand-ins (see docker-compose.shards.yml), writes a chat and a commit
+for each user through the services and verifies every user's documents live
+on exactly the deployment they route to. Run from the backend directory:
+
+    python benchmarks/bench_sharding.py --deployments 3 --users 100000
+    python benchmarks/bench_sharding.py --users 200 \
+        --urls a=mongodb://localhost:27018,b=mongodb://localhost:27019,c=mongodb://localhost:27020
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.db import database
+from app.db.database import connect_to_mongo, close_mongo_connection, create_indexes, deployment_for_user, get_user_database, rendezvous
+
+def distribution(deployments: int, users: int):
+    names = [f"shard{i}" for i in range(deployments)]
+    ids = [uuid.uuid4().hex for _ in range(users)]
+    started = time.perf_counter()
+    placement = {u: rendezvous(u, names) for u in ids}
+    elapsed = time.perf_counter() - started
+    counts = Counter(placement.values())
+    grown = names + [f"shard{deployments}"]
+    moved = sum(1 for u in ids if rendezvous(u, grown) != placement[u])
+
+    for name in names:
+        print(f"{name:<10} {counts[name]:>8} users ({counts[name] / users:.1%})")
+    print(f"routing cost             {elapsed / users * 1e6:.2f} µs/user")
+    print(f"moved when adding one    {moved / users:.1%} (ideal {1 / (deployments + 1):.1%})")
+
+async def verify(urls: str, users: int):
+    from app.services.services import ChatService, CommitService
+
+    settings.mongodb_shard_urls = urls
+    settings.database_name = f"bench_sharding_{uuid.uuid4().hex[:8]}"
+    await connect_to_mongo()
+    try:
+        await create_indexes()
+        chats, commits = ChatService(), CommitService()
+        ids = [f"bench-user-{i}" for i in range(users)]
+        for user_id in ids:
+            db = await get_user_database(user_id)
+            chat = await chats.create_chat(user_id, db)
+            await commits.create_commit(chat["chatId"], "bench", user_id, db)
+
+        misplaced = 0
+        for name, shard in database.db.shards.items():
+            owners = set(await shard.chats.distinct("userId")) | set(await shard.commits.distinct("userId"))
+            misplaced += sum(1 for u in owners if deployment_for_user(u) != name)
+            print(f"{name:<10} {await shard.chats.count_documents({}):>6} chats {await shard.commits.count_documents({}):>6} commits")
+        print(f"misplaced users          {misplaced}")
+    finally:
+        for shard in database.db.shards.values():
+            await shard.client.drop_database(shard.name)
+        await database.db.client.drop_database(settings.database_name)
+        await close_mongo_connection()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deployments", type=int, default=3)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--urls", help="MONGODB_SHARD_URLS to verify against (MONGODB_URL holds users)")
+    args = parser.parse_args()
+
+    print("🚀 Sharding check")
+    print("=" * 40)
+    if args.urls:
+        asyncio.run(verify(args.urls, args.users))
+    else:
+        distribution(args.deployments, args.users)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for PromptPilot Backend
+
+Measures how long a fresh process takes to import the app and to serve its
+first healthy response. Requires MongoDB (the lifespan connects at startup).
+Run from the backend directory:
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+PORT = 8766
+BASE_URL = f"http://127.0.0.1:{PORT}"
+
+def measure_import() -> float:
+    """Seconds for a cold interpreter to import the application module"""
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.check_output([sys.executable, "-c", code])
+    return float(out.decode().strip().splitlines()[-1])
+
+def measure_first_healthy(timeout: float = 60.0) -> float:
+    """Seconds from process spawn to the first 200 from /health"""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(PORT), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if httpx.get(f"{BASE_URL}/health", timeout=0.5).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError("server did not become healthy")
+    finally:
+        server.terminate()
+        server.wait()
+
+def summarize(label: str, samples):
+    print(f"{label:<28} median {statistics.median(samples) * 1000:8.1f} ms   min {min(samples) * 1000:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print("🚀 Startup benchmark")
+    print("=" * 40)
+    summarize("import main", [measure_import() for _ in range(args.runs)])
+    summarize("time to first healthy", [measure_first_healthy() for _ in range(args.runs)])
+
+if __name__ == "__main__":
+    main()
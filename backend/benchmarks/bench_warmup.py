@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Model warm-up benchmark for PromptPilot Backend
+
+Measures first-turn latency against the fake Ollama server with a simulated
+model load time, cold versus after the warm-up manager has preloaded the
+models, and shows a turn falling back to the warm model while the routed one is
+still loading. Does not need MongoDB or Ollama. Run from the backend directory:
+
+    python benchmarks/bench_warmup.py --load-seconds 2
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_ollama import FakeOllama
+from app.core.config import settings
+from app.services.llm import OllamaClient
+from app.services.routing import model_router
+from app.services.services import ChatService
+from app.services.warmup import model_warmer
+
+async def first_turn(service: ChatService, model: str) -> float:
+    started = time.perf_counter()
+    await service._get_ai_response("Human: hi\nAssistant: ", model=model)
+    return time.perf_counter() - started
+
+async def run(load_seconds: float):
+    fake = FakeOllama(tokens=20, token_interval=0.005, load_seconds=load_seconds)
+    await fake.start()
+    client = OllamaClient(fake.base_url, timeout=60)
+    service = ChatService()
+    service.llm = client
+
+    cold = await first_turn(service, "bench-cold")
+
+    model_warmer.client = client
+    started = time.perf_counter()
+    model_warmer.start(["bench-warm"])
+    while not model_warmer.is_ready("bench-warm"):
+        await asyncio.sleep(0.01)
+    preload = time.perf_counter() - started
+    warm = await first_turn(service, "bench-warm")
+    await model_warmer.stop()
+
+    # The fast model is resident, the large one starts loading now
+    settings.ollama_model, settings.ollama_fast_model = "bench-large", "bench-warm"
+    model_warmer.models.clear()
+    model_warmer.start(model_router.routes().values())
+    await asyncio.sleep(0.05)
+    loading = model_router.route("please refactor this module", [])
+    while not model_warmer.is_ready("bench-large"):
+        await asyncio.sleep(0.01)
+    loaded = model_router.route("please refactor this module", [])
+
+    print(f"first turn, cold model     {cold * 1000:.0f} ms")
+    print(f"preload (off request path) {preload * 1000:.0f} ms")
+    print(f"first turn, preloaded      {warm * 1000:.0f} ms")
+    print(f"heavy turn while loading   routed to {loading.route} ({loading.model})")
+    print(f"heavy turn once loaded     routed to {loaded.route} ({loaded.model})")
+
+    await model_warmer.stop()
+    await client.close()
+    await fake.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--load-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print("🚀 Model warm-up benchmark")
+    print("=" * 40)
+    asyncio.run(run(args.load_seconds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Worker scaling benchmark for PromptPilot Backend
+
+Starts the app under gunicorn with an increasing number of workers and measures
+throughput of non-LLM endpoints: `/`, `/health` and an authenticated,
+Mongo-backed `/v1/chat/list`. Requires MongoDB but not Ollama. Run from the backend directory:
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --requests 5000
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+PORT = 8765
+BASE_URL = f"http://127.0.0.1:{PORT}"
+ENDPOINTS = ["/", "/health", "/v1/chat/list"]
+
+def start_server(workers: int) -> subprocess.Popen:
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "BIND": f"127.0.0.1:{PORT}", "SHARED_STATE_BACKEND": "file"}
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app", "--access-logfile", "/dev/null"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+def wait_until_healthy(timeout: float = 30.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{BASE_URL}/health", timeout=1).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    return False
+
+def bench_user_headers() -> dict:
+    """Register a throwaway user with a few chats so the list read returns data"""
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    response = httpx.post(f"{BASE_URL}/v1/auth/register", json={"name": "Bench", "email": email, "password": "benchpassword"})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    for _ in range(5):
+        httpx.post(f"{BASE_URL}/v1/chat/new", headers=headers).raise_for_status()
+    return headers
+
+async def load(total: int, concurrency: int, headers: dict) -> float:
+    """Fire `total` requests with `concurrency` connections; returns requests/second"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, headers=headers) as client:
+        counter = iter(range(total))
+
+        async def worker():
+            for i in counter:
+                response = await client.get(ENDPOINTS[i % len(ENDPOINTS)])
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    print("🚀 Worker scaling benchmark")
+    print("=" * 40)
+    baseline = None
+    for workers in args.workers:
+        server = start_server(workers)
+        try:
+            if not wait_until_healthy():
+                print(f"❌ Server with {workers} workers did not become healthy")
+                sys.exit(1)
+            headers = bench_user_headers()
+            asyncio.run(load(min(500, args.requests), args.concurrency, headers))  # warm-up
+            rps = asyncio.run(load(args.requests, args.concurrency, headers))
+        finally:
+            server.terminate()
+            server.wait()
+
+        baseline = baseline or rps / workers
+        efficiency = rps / (baseline * workers)
+        print(f"workers={workers:<3} {rps:>10.0f} req/s   scaling efficiency {efficiency:.0%}")
+
+if __name__ == "__main__":
+    main()
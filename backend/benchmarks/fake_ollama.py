@@ -0,0 +1,110 @@
+"""
+Fake Ollama server for benchmarks
+
+Speaks just enough of POST /api/generate (streaming NDJSON and non-streaming)
+and GET /api/ps to exercise the backend without a GPU. Each generation emits
+one token every `token_interval` seconds and holds a slot until it finishes or
+the client disconnects, so slot usage shows whether aborted requests free
+capacity. The first request for a model that is not loaded waits
+`load_seconds`, like Ollama loading weights.
+"""
+
+import asyncio
+import json
+from typing import Optional
+
+class FakeOllama:
+    def __init__(
+        self,
+        tokens: int = 200,
+        token_interval: float = 0.02,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        load_seconds: float = 0.0,
+    ):
+        self.tokens = tokens
+        self.token_interval = token_interval
+        self.load_seconds = load_seconds
+        self.loaded = set()
+        self.host = host
+        self.port = port
+        self.active = 0
+        self.completed = 0
+        self.aborted = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            request_line = head.decode().split("\r\n", 1)[0]
+            length = 0
+            for line in head.decode().split("\r\n"):
+                if line.lower().startswith("content-length:"):
+                    length = int(line.split(":", 1)[1])
+            body = json.loads(await reader.readexactly(length)) if length else {}
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+
+        if request_line.startswith("GET /api/ps"):
+            self._write_json(writer, {"models": [{"name": name} for name in sorted(self.loaded)]})
+            await writer.drain()
+            writer.close()
+            return
+
+        stream = body.get("stream", True)
+        self.active += 1
+        try:
+            model = body.get("model", "")
+            tagged = model if ":" in model else f"{model}:latest"
+            if tagged not in self.loaded:
+                await asyncio.sleep(self.load_seconds)
+                self.loaded.add(tagged)
+            if "prompt" not in body:
+                # Load-only request
+                self._write_json(writer, {"model": model, "response": "", "done": True})
+                await writer.drain()
+            elif stream:
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+                for i in range(self.tokens):
+                    await asyncio.sleep(self.token_interval)
+                    if reader.at_eof():
+                        raise ConnectionResetError()
+                    self._write_chunk(writer, {"response": f"tok{i} ", "done": False})
+                    await writer.drain()
+                self._write_chunk(writer, {"response": "", "done": True, "prompt_eval_count": 10, "eval_count": self.tokens})
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+            else:
+                await asyncio.sleep(self.tokens * self.token_interval)
+                self._write_json(writer, {"response": "ok", "done": True})
+                await writer.drain()
+            self.completed += 1
+        except ConnectionError:
+            self.aborted += 1
+        finally:
+            self.active -= 1
+            writer.close()
+
+    @staticmethod
+    def _write_json(writer: asyncio.StreamWriter, data: dict):
+        payload = json.dumps(data).encode()
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n" % len(payload) + payload)
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, data: dict):
+        line = json.dumps(data).encode() + b"\n"
+        writer.write(b"%x\r\n" % len(line) + line + b"\r\n")
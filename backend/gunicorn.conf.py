@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration for multi-worker deployments
+
+Run with: gunicorn -c gunicorn.conf.py main:app
+Every worker runs its own event loop and copy of the services; state that must
+be shared between them (idempotency results, maintenance locks, counters) goes
+through SHARED_STATE_BACKEND, which should be "file" (one host) or "mongo".
+With more than one worker, "memory" is replaced by "file" before the workers start.
+"""
+
+import multiprocessing
+import os
+
+from app.core.config import settings
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Requests are I/O bound (Mongo, Ollama), so one async worker per core is enough;
+# cap it so a large host does not open more Mongo connections than it needs.
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 8)))
+
+# Process-local state would give every worker its own idempotency keys, cancel flags,
+# rate limits, maintenance locks and chat cache; workers inherit this environment
+if workers > 1 and settings.shared_state_backend.lower() == "memory":
+    print(f"⚠️ SHARED_STATE_BACKEND=memory is only correct with one worker; using file ({settings.shared_state_path}) for {workers} workers")
+    os.environ["SHARED_STATE_BACKEND"] = "file"
+    # Settings are already loaded here and forked workers inherit them
+    settings.shared_state_backend = "file"
+
+# LLM generations can take minutes; do not let the arbiter kill busy workers
+timeout = int(os.getenv("WORKER_TIMEOUT", 300))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("KEEPALIVE", 5))
+
+# Recycle workers periodically to bound memory growth
+max_requests = int(os.getenv("MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 200))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
@@ -1,11 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 
 from app.core.config import settings
+from app.core.load_shedding import LoadSheddingMiddleware, load_monitor
+from app.core.profiling import RequestTracingMiddleware, slow_request_log
 from app.api.api import api_router
-from app.db.database import connect_to_mongo, close_mongo_connection, create_indexes
+from app.db.database import connect_to_mongo, close_mongo_connection, create_indexes, db
+from app.services.maintenance import maintenance_worker, tiering_worker
+from app.services.chat_cache import chat_cache
+from app.services.llm import ollama_client
+from app.services.routing import model_router
+from app.services.warmup import model_warmer
 
 # Initialize FastAPI app
 @asynccontextmanager
@@ -17,11 +27,36 @@ async def lifespan(app: FastAPI):
     
     # Connect to database and create indexes
     await connect_to_mongo()
-    await create_indexes()
+    index_task = None
+    if settings.create_indexes_in_background:
+        index_task = asyncio.create_task(create_indexes())
+    else:
+        await create_indexes()
+    
+    # Background commit retention / compaction
+    maintenance_worker.start()
+    
+    # Background demotion of idle chats / old commits to cold storage
+    tiering_worker.start()
+    
+    # Preload routed models and keep them resident in Ollama
+    model_warmer.start(model_router.routes().values())
+    
+    # Event-loop lag sampling for load shedding and /health
+    load_monitor.start()
     
     yield
     
     # Shutdown
+    await load_monitor.stop()
+    await model_warmer.stop()
+    await tiering_worker.stop()
+    await maintenance_worker.stop()
+    if index_task is not None:
+        if not index_task.done():
+            index_task.cancel()
+        await asyncio.gather(index_task, return_exceptions=True)
+    await ollama_client.close()
     await close_mongo_connection()
     print("👋 Shutting down PromptPilot Backend...")
 
@@ -29,9 +64,20 @@ app = FastAPI(
     title="PromptPilot API",
     description="AI-Powered Development Assistant Backend",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Compress large payloads (message arrays, commit history)
+if settings.gzip_minimum_size > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.gzip_minimum_size)
+
+# Per-request stage tracing for slow-request capture (innermost, so shed requests are not traced)
+app.add_middleware(RequestTracingMiddleware, log=slow_request_log)
+
+# Load shedding (added before CORS so CORS headers still wrap rejected responses)
+app.add_middleware(LoadSheddingMiddleware, monitor=load_monitor)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -54,7 +100,13 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "PromptPilot Backend"}
+    return {
+        **load_monitor.snapshot(),
+        "models": model_warmer.snapshot(),
+        "chatCache": chat_cache.snapshot(),
+        "indexes": db.index_status,
+        "service": "PromptPilot Backend"
+    }
 
 if __name__ == "__main__":
     uvicorn.run(
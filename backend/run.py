@@ -12,10 +12,10 @@ from pathlib import Path
 def check_ollama():
     """Check if Ollama is running and has the required model"""
     try:
-        import requests
+        import httpx
         from app.core.config import settings
         
-        response = requests.get(f"{settings.ollama_base_url}/api/tags", timeout=5)
+        response = httpx.get(f"{settings.ollama_base_url}/api/tags", timeout=5)
         if response.status_code == 200:
             models = response.json().get("models", [])
             model_names = [model["name"] for model in models]
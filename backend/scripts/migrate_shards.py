@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Move user data to the deployment it routes to under MONGODB_SHARD_URLS
+
+Run after setting MONGODB_SHARD_URLS for the first time (every user's data is
+still on MONGODB_URL) or after adding a deployment (about 1/N of users now
+route to it). Each user's chats, commits, usage, cold storage and chat
+counters are copied to `deployment_for_user` and then removed from where
+they were. Copies are upserts by _id, so an interrupted run can simply be
+started again. Stop the API (or take it out of rotation) while it runs:
+users being moved would otherwise see their history split across two
+places. Run from the backend directory:
+
+    python scripts/migrate_shards.py --dry-run
+    python scripts/migrate_shards.py
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from typing import Dict, List, Set
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.db import database
+from app.db.database import USER_COLLECTIONS, close_mongo_connection, connect_to_mongo, deployment_for_user
+
+BATCH_SIZE = 500
+COUNTER_PREFIX = "chats:"
+
+async def users_on(source: AsyncIOMotorDatabase) -> Set[str]:
+    users: Set[str] = set()
+    for name in USER_COLLECTIONS:
+        users.update(await source[name].distinct("userId"))
+    # Chat counters are keyed by "chats:<userId>" and carry no userId field
+    counter_ids = await source.counters.distinct("_id", {"_id": {"$regex": f"^{COUNTER_PREFIX}"}})
+    users.update(c[len(COUNTER_PREFIX):] for c in counter_ids)
+    return users
+
+async def _copy(source, target, query: Dict) -> int:
+    copied, batch = 0, []
+    async for doc in source.find(query):
+        batch.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+        if len(batch) >= BATCH_SIZE:
+            await target.bulk_write(batch, ordered=False)
+            copied, batch = copied + len(batch), []
+    if batch:
+        await target.bulk_write(batch, ordered=False)
+        copied += len(batch)
+    return copied
+
+async def migrate_user(user_id: str, source: AsyncIOMotorDatabase, target: AsyncIOMotorDatabase) -> int:
+    """Copy every document of a user to target, then delete it from source; returns documents moved"""
+    queries = [(name, {"userId": user_id}) for name in USER_COLLECTIONS]
+    queries.append(("counters", {"_id": f"{COUNTER_PREFIX}{user_id}"}))
+    moved = 0
+    # Everything is copied before anything is deleted, so a crash never loses data
+    for name, query in queries:
+        moved += await _copy(source[name], target[name], query)
+    for name, query in queries:
+        await source[name].delete_many(query)
+    return moved
+
+async def migrate(sources: Dict[str, AsyncIOMotorDatabase], dry_run: bool = False) -> Dict[str, int]:
+    """Move misplaced users from every source to their deployment (database.db.shards)"""
+    report = {"users": 0, "documents": 0}
+    for source_name, source in sources.items():
+        misplaced: List[str] = [u for u in sorted(await users_on(source)) if deployment_for_user(u) != source_name]
+        print(f"{source_name:<10} {len(misplaced):>8} users to move")
+        for user_id in misplaced:
+            target_name = deployment_for_user(user_id)
+            if dry_run:
+                continue
+            report["documents"] += await migrate_user(user_id, source, database.db.shards[target_name])
+            report["users"] += 1
+    return report
+
+async def main_async(dry_run: bool):
+    if not settings.normalized_shard_urls():
+        print("❌ MONGODB_SHARD_URLS is not set; there is nowhere to move users to")
+        sys.exit(1)
+    await connect_to_mongo()
+    try:
+        sources = dict(database.db.shards)
+        shard_urls = {url for _, url in settings.normalized_shard_urls()}
+        if settings.mongodb_url not in shard_urls:
+            # Data written before MONGODB_SHARD_URLS was set lives on MONGODB_URL
+            sources["(primary)"] = database.db.database
+        report = await migrate(sources, dry_run)
+        if not dry_run:
+            print(f"✅ Moved {report['users']} users ({report['documents']} documents)")
+    finally:
+        await close_mongo_connection()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="only count the users that would move")
+    args = parser.parse_args()
+
+    print("🚚 Shard migration")
+    print("=" * 40)
+    asyncio.run(main_async(args.dry_run))
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@
 Simple API test script for PromptPilot Backend
 """
 
-import requests
+import httpx
 import json
 import time
 
@@ -13,7 +13,7 @@ def test_health():
     """Test health endpoint"""
     print("🔍 Testing health endpoint...")
     try:
-        response = requests.get(f"{BASE_URL}/health")
+        response = httpx.get(f"{BASE_URL}/health")
         if response.status_code == 200:
             print("✅ Health check passed")
             return True
@@ -33,7 +33,7 @@ def test_register():
             "email": "test@example.com",
             "password": "testpassword123"
         }
-        response = requests.post(f"{BASE_URL}/auth/register", json=user_data)
+        response = httpx.post(f"{BASE_URL}/auth/register", json=user_data)
         if response.status_code == 200:
             token_data = response.json()
             print("✅ User registration successful")
@@ -54,7 +54,7 @@ def test_login():
             "email": "test@example.com",
             "password": "testpassword123"
         }
-        response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+        response = httpx.post(f"{BASE_URL}/auth/login", json=login_data)
         if response.status_code == 200:
             token_data = response.json()
             print("✅ User login successful")
@@ -76,7 +76,7 @@ def test_chat(token):
             "chatId": "test-chat-123",
             "userMessage": "Hello! Can you help me with Python programming?"
         }
-        response = requests.post(f"{BASE_URL}/chat", json=chat_data, headers=headers)
+        response = httpx.post(f"{BASE_URL}/chat", json=chat_data, headers=headers, timeout=300)
         if response.status_code == 200:
             chat_response = response.json()
             print("✅ Chat request successful")
@@ -99,7 +99,7 @@ def test_commit(token, chat_id):
             "chatId": chat_id,
             "name": "Initial Python help session"
         }
-        response = requests.post(f"{BASE_URL}/commit", json=commit_data, headers=headers)
+        response = httpx.post(f"{BASE_URL}/commit", json=commit_data, headers=headers)
         if response.status_code == 200:
             commit_response = response.json()
             print("✅ Commit creation successful")
@@ -118,7 +118,7 @@ def test_commit_history(token, chat_id):
     print("🔍 Testing commit history endpoint...")
     try:
         headers = {"Authorization": f"Bearer {token}"}
-        response = requests.get(f"{BASE_URL}/commits/{chat_id}", headers=headers)
+        response = httpx.get(f"{BASE_URL}/commits/{chat_id}", headers=headers)
         if response.status_code == 200:
             history_response = response.json()
             print("✅ Commit history retrieval successful")
@@ -0,0 +1,68 @@
+"""
+Shared fixtures: an in-memory Mongo (mongomock), the fake Ollama server from
+benchmarks/ and an HTTP client on the app with auth overridden.
+"""
+
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import main
+from app.api.v1 import chat as chat_api
+from app.api.v1 import commits as commits_api
+from app.core.auth import get_current_user, get_current_user_database
+from app.services.chat_cache import chat_cache
+from app.services.llm import OllamaClient
+from app.services.services import ChatService, CommitService
+from app.services.usage import usage_service
+from benchmarks.fake_ollama import FakeOllama
+
+USER_ID = "test-user"
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(autouse=True)
+def reset_singletons():
+    chat_cache._entries.clear()
+    chat_cache.bytes = 0
+    usage_service._buckets.clear()
+    usage_service._daily.clear()
+    yield
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["promptpilot_test"]
+
+@pytest.fixture
+async def ollama():
+    server = FakeOllama(tokens=3, token_interval=0.001)
+    await server.start()
+    client = OllamaClient(server.base_url, 10)
+    yield server, client
+    await client.close()
+    await server.stop()
+
+@pytest.fixture
+def chat_service(ollama):
+    service = ChatService()
+    service.llm = ollama[1]
+    return service
+
+@pytest.fixture
+def commit_service():
+    return CommitService()
+
+@pytest.fixture
+async def client(db, ollama, monkeypatch):
+    async def user_database():
+        return db
+
+    monkeypatch.setattr(chat_api.chat_service, "llm", ollama[1])
+    monkeypatch.setattr(commits_api.chat_service, "llm", ollama[1])
+    main.app.dependency_overrides[get_current_user] = lambda: {"id": USER_ID, "email": "test@example.com", "name": "Test"}
+    main.app.dependency_overrides[get_current_user_database] = user_database
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as http:
+        yield http
+    main.app.dependency_overrides.clear()
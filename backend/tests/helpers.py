@@ -0,0 +1,16 @@
+from datetime import datetime, timedelta
+from typing import List
+
+async def commit_turns(chat_service, commit_service, chat_id: str, user_id: str, db, turns: int) -> List[str]:
+    """Run `turns` chat turns, committing after each; commits are spaced a minute apart"""
+    ids = []
+    for i in range(turns):
+        await chat_service.process_message(chat_id, f"message {i}", user_id, db)
+        ids.append((await commit_service.create_commit(chat_id, f"checkpoint {i}", user_id, db)).commitId)
+    start = datetime.utcnow() - timedelta(minutes=len(ids))
+    for i, commit_id in enumerate(ids):
+        await db.commits.update_one({"commitId": commit_id}, {"$set": {"timestamp": start + timedelta(minutes=i)}})
+    return ids
+
+def user_messages(messages) -> List[str]:
+    return [m["content"] for m in messages if m["role"] == "user"]
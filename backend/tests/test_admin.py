@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.config import settings
+from app.core.profiling import RequestTrace, _current_trace, slow_request_log, stage
+from tests.conftest import USER_ID
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(settings, "admin_emails", "Test@Example.com")
+
+@pytest.fixture
+def explained(db, monkeypatch):
+    """Record (database name, command) for each explain instead of running it"""
+    calls = []
+
+    async def command(database, name, spec, **kwargs):
+        calls.append((database.name, spec))
+        return {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "userId_1_chatId_1"}}}}
+
+    monkeypatch.setattr(type(db), "command", command)
+    monkeypatch.setattr(slow_request_log, "entries", type(slow_request_log.entries)(maxlen=10))
+    return calls
+
+async def test_admin_endpoints_require_an_admin(client):
+    assert (await client.get("/v1/admin/slow-requests")).status_code == 403
+    assert (await client.post("/v1/admin/profile", params={"seconds": 0.01})).status_code == 403
+
+async def test_profile_window_is_limited(client, admin):
+    response = await client.post("/v1/admin/profile", params={"seconds": settings.profile_max_seconds + 1})
+    assert response.status_code == 400
+
+async def test_profile_returns_collapsed_stacks(client, admin):
+    response = await client.post("/v1/admin/profile", params={"seconds": 0.05, "interval_ms": 1})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for line in response.text.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert stack and int(count) > 0
+
+async def test_slow_requests_are_explained_on_the_database_queried(client, admin, db, explained, monkeypatch):
+    monkeypatch.setattr(settings, "slow_request_threshold_ms", 0.001)
+    await db.chats.insert_one({"chatId": "chat", "userId": USER_ID, "messages": [], "revision": 1})
+
+    assert (await client.get("/v1/chat/chat/messages")).status_code == 200
+    # Explains run in the background
+    for _ in range(50):
+        if explained:
+            break
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.01)
+
+    response = await client.get("/v1/admin/slow-requests")
+    assert response.status_code == 200
+    requests = response.json()["requests"]
+    captured = next(r for r in requests if r["path"] == "/v1/chat/chat/messages")
+    assert captured["queries"][0]["collection"] == "chats"
+    assert captured["queries"][0]["filter"] == {"chatId": "str", "userId": "str"}
+    assert captured["queries"][0]["plan"] == ["FETCH", "IXSCAN userId_1_chatId_1"]
+    assert {name for name, _ in explained} == {db.name}
+    assert not slow_request_log._explains
+
+async def test_explain_uses_each_querys_own_database(db, explained):
+    shard = AsyncMongoMockClient()["promptpilot_shard"]
+    trace = RequestTrace("GET", "/x")
+    token = _current_trace.set(trace)
+    try:
+        with stage("a", db.chats, {"userId": "u"}):
+            pass
+        with stage("b", shard.commits, {"userId": "u"}):
+            pass
+    finally:
+        _current_trace.reset(token)
+
+    slow_request_log.record(trace, 200, 1.0)
+    await asyncio.gather(*slow_request_log._explains)
+
+    assert explained == [
+        (db.name, {"find": "chats", "filter": {"userId": "u"}}),
+        ("promptpilot_shard", {"find": "commits", "filter": {"userId": "u"}}),
+    ]
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.core.shared_state import FileBackend
+from app.services import services
+from app.services.llm import OllamaClient
+from app.services.services import ChatService, GenerationCancelled
+from benchmarks.fake_ollama import FakeOllama
+
+pytestmark = pytest.mark.anyio
+
+USER = "user-1"
+
+@pytest.fixture
+async def workers(monkeypatch, tmp_path):
+    """Two chat services sharing a file backend, standing in for two workers"""
+    monkeypatch.setattr(settings, "shared_state_backend", "file")
+    monkeypatch.setattr(settings, "disconnect_poll_seconds", 0.01)
+    monkeypatch.setattr(settings, "cancel_poll_seconds", 0.1)
+    monkeypatch.setattr(settings, "rate_limit_turns_per_minute", 0)
+    backend = FileBackend(str(tmp_path / "state.sqlite3"))
+    reads = []
+    get = backend.get
+
+    async def counting_get(key):
+        reads.append(key)
+        return await get(key)
+
+    monkeypatch.setattr(backend, "get", counting_get)
+    monkeypatch.setattr(services, "shared_state", backend)
+    server = FakeOllama(tokens=100, token_interval=0.01)
+    await server.start()
+    llm = OllamaClient(server.base_url, 10)
+    pair = [ChatService(), ChatService()]
+    for service in pair:
+        service.llm = llm
+    yield pair, reads, server
+    await llm.close()
+    await server.stop()
+
+async def test_cancel_on_another_worker_stops_the_generation(workers, db):
+    (generating, other), reads, server = workers
+    turn = asyncio.create_task(generating.process_message_cancellable("chat", "hello", USER, db))
+    await asyncio.sleep(0.05)
+
+    started = time.monotonic()
+    assert await other.cancel_generation("chat", USER) is False
+    with pytest.raises(GenerationCancelled):
+        await asyncio.wait_for(turn, timeout=1)
+    assert time.monotonic() - started < 0.5
+    # Disconnect checks run every 10ms; the shared flag is read at most every 100ms
+    assert 1 <= len(reads) <= 3
+    await asyncio.sleep(0.05)
+    assert server.aborted == 1
+
+async def test_earlier_cancel_does_not_stop_a_later_turn(workers, db):
+    (generating, other), _, server = workers
+    server.tokens = 20
+    # Nothing was running here, so the flag is left for a generation on another worker
+    assert await other.cancel_generation("chat", USER) is False
+    await asyncio.sleep(0.01)
+
+    response = await asyncio.wait_for(generating.process_message_cancellable("chat", "hello", USER, db), timeout=2)
+
+    assert response.assistantMessage
+    assert server.aborted == 0
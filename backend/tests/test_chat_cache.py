@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.services.chat_cache import chat_cache
+from app.services.tiering import tiering_service
+from tests.helpers import commit_turns, user_messages
+
+pytestmark = pytest.mark.anyio
+
+USER = "user-1"
+
+class ReadCounter:
+    """Counts full chat document reads"""
+
+    def __init__(self, db, monkeypatch):
+        self.count = 0
+        original = type(db.chats).find_one
+
+        async def find_one(collection, *args, **kwargs):
+            projection = args[1] if len(args) > 1 else kwargs.get("projection")
+            if collection.name == "chats" and not projection:
+                self.count += 1
+            return await original(collection, *args, **kwargs)
+
+        monkeypatch.setattr(type(db.chats), "find_one", find_one)
+
+async def test_turns_write_through(chat_service, db, monkeypatch):
+    reads = ReadCounter(db, monkeypatch)
+    await chat_service.process_message("chat", "first", USER, db)
+    reads.count = 0
+
+    await chat_service.process_message("chat", "second", USER, db)
+    messages = await chat_service.get_chat_messages("chat", USER, db)
+
+    assert reads.count == 0
+    assert user_messages(messages) == ["first", "second"]
+    stored = await db.chats.find_one({"chatId": "chat"})
+    assert stored["messages"] == messages
+    assert stored["revision"] == chat_cache.peek("chat", USER).revision == 2
+
+async def test_shared_backend_sees_other_workers(chat_service, db, monkeypatch):
+    monkeypatch.setattr(settings, "shared_state_backend", "file")
+    await chat_service.process_message("chat", "first", USER, db)
+    # Another worker appends a turn
+    await db.chats.update_one(
+        {"chatId": "chat"},
+        {"$push": {"messages": {"role": "user", "content": "elsewhere"}}, "$inc": {"revision": 1}},
+    )
+
+    assert user_messages(await chat_service.get_chat_messages("chat", USER, db)) == ["first", "elsewhere"]
+    assert await chat_service.messages_revision("chat", USER, db) == 2
+
+async def test_stale_entry_does_not_lose_turns(chat_service, db):
+    await chat_service.process_message("chat", "first", USER, db)
+    await db.chats.update_one({"chatId": "chat"}, {"$push": {"messages": {"role": "user", "content": "elsewhere"}}, "$inc": {"revision": 1}})
+
+    # Single-worker mode trusts the entry, so the guarded append misses and falls back
+    await chat_service.process_message("chat", "second", USER, db)
+
+    assert chat_cache.peek("chat", USER) is None
+    assert user_messages(await chat_service.get_chat_messages("chat", USER, db)) == ["first", "elsewhere", "second"]
+
+async def test_fetch_and_demotion_invalidate(chat_service, commit_service, db, monkeypatch):
+    ids = await commit_turns(chat_service, commit_service, "chat", USER, db, 2)
+    await chat_service.get_chat_messages("chat", USER, db)
+
+    await commit_service.fetch_commit(ids[0], USER, db)
+    assert chat_cache.peek("chat", USER) is None
+    assert user_messages(await chat_service.get_chat_messages("chat", USER, db)) == ["message 0"]
+
+    monkeypatch.setattr(settings, "tiering_batch_pause_ms", 0)
+    await db.chats.update_one({"chatId": "chat"}, {"$set": {"updated_at": datetime.utcnow() - timedelta(days=365)}})
+    await tiering_service.run_once(db)
+    assert chat_cache.peek("chat", USER) is None
+    assert user_messages(await chat_service.get_chat_messages("chat", USER, db)) == ["message 0"]
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from app.db.database import create_user_data_indexes
+
+pytestmark = pytest.mark.anyio
+
+USER = "user-1"
+
+async def test_first_chat_numbers_skip_legacy_chats_under_concurrency(chat_service, db, monkeypatch):
+    await db.chats.insert_many([{"chatId": f"legacy-{i}", "userId": USER, "messages": []} for i in range(3)])
+    original = type(db.chats).count_documents
+
+    async def slow_count(collection, *args, **kwargs):
+        # Let the other tabs' requests run while the legacy chats are counted
+        await asyncio.sleep(0.01)
+        return await original(collection, *args, **kwargs)
+
+    monkeypatch.setattr(type(db.chats), "count_documents", slow_count)
+
+    numbers = await asyncio.gather(*(chat_service.next_chat_number(USER, db) for _ in range(4)))
+
+    assert sorted(numbers) == [4, 5, 6, 7]
+
+async def test_first_chat_number_without_legacy_chats(chat_service, db):
+    assert await chat_service.next_chat_number(USER, db) == 1
+    assert await chat_service.next_chat_number(USER, db) == 2
+
+async def test_duplicate_chats_are_removed_before_unique_index(db):
+    await db.chats.insert_many([
+        {"chatId": "dup", "userId": USER, "messages": []},
+        {"chatId": "dup", "userId": USER, "messages": [{"role": "user", "content": "kept"}]},
+        {"chatId": "dup", "userId": USER},
+        {"chatId": "dup", "userId": "someone-else", "messages": []},
+    ])
+
+    await create_user_data_indexes(db)
+
+    remaining = await db.chats.find({"chatId": "dup"}).to_list(None)
+    assert sorted(c["userId"] for c in remaining) == ["someone-else", USER]
+    assert next(c for c in remaining if c["userId"] == USER)["messages"][0]["content"] == "kept"
+    assert (await db.chats.index_information())["userId_1_chatId_1"]["unique"]
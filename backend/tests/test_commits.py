@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.services.maintenance import retention_service
+from tests.helpers import commit_turns, user_messages
+
+pytestmark = pytest.mark.anyio
+
+USER = "user-1"
+
+@pytest.fixture(autouse=True)
+def keep_last_one(monkeypatch):
+    monkeypatch.setattr(settings, "retention_policies", "keep_last")
+    monkeypatch.setattr(settings, "retention_keep_last", 1)
+    monkeypatch.setattr(settings, "retention_batch_pause_ms", 0)
+
+async def test_fork_is_copy_on_write(chat_service, commit_service, db):
+    ids = await commit_turns(chat_service, commit_service, "source", USER, db, 2)
+    fork = await commit_service.fork_commit(ids[0], USER, db)
+    await chat_service.process_message(fork.chatId, "on the fork", USER, db)
+
+    assert user_messages(await chat_service.get_chat_messages(fork.chatId, USER, db)) == ["message 0", "on the fork"]
+    assert user_messages(await chat_service.get_chat_messages("source", USER, db)) == ["message 0", "message 1"]
+    assert (await db.chats.find_one({"chatId": fork.chatId}))["messages"][0]["content"] == "on the fork"
+
+async def test_fetch_detaches_forks_of_dropped_commits(chat_service, commit_service, db):
+    ids = await commit_turns(chat_service, commit_service, "source", USER, db, 3)
+    fork = await commit_service.fork_commit(ids[2], USER, db)
+
+    restored = await commit_service.fetch_commit(ids[0], USER, db)
+
+    assert user_messages(restored.restoredMessages) == ["message 0"]
+    assert await db.commits.count_documents({"chatId": "source"}) == 1
+    fork_doc = await db.chats.find_one({"chatId": fork.chatId})
+    assert "baseCommitId" not in fork_doc
+    assert user_messages(await chat_service.get_chat_messages(fork.chatId, USER, db)) == ["message 0", "message 1", "message 2"]
+
+async def test_retention_keeps_forked_history(chat_service, commit_service, db):
+    ids = await commit_turns(chat_service, commit_service, "source", USER, db, 3)
+    fork = await commit_service.fork_commit(ids[0], USER, db)
+
+    report = await retention_service.run_once(db)
+
+    # ids[0] survives because the fork shares it; ids[1] is dropped
+    assert report["commitsDeleted"] == 1
+    remaining = set(await db.commits.distinct("commitId"))
+    assert remaining == {ids[0], ids[2]}
+    assert user_messages(await chat_service.get_chat_messages(fork.chatId, USER, db)) == ["message 0"]
+    latest = await db.commits.find_one({"commitId": ids[2]})
+    assert user_messages(await commit_service.resolve_commit_messages(latest, db)) == ["message 0", "message 1", "message 2"]
+
+async def test_retention_collects_commits_of_deleted_chat(chat_service, commit_service, db):
+    ids = await commit_turns(chat_service, commit_service, "source", USER, db, 2)
+    fork = await commit_service.fork_commit(ids[1], USER, db)
+    await db.chats.delete_one({"chatId": "source"})
+
+    await retention_service.run_once(db)
+
+    assert await db.commits.count_documents({"chatId": "source"}) == 0
+    assert user_messages(await chat_service.get_chat_messages(fork.chatId, USER, db)) == ["message 0", "message 1"]
+
+async def test_retention_on_forked_chat_with_commits(chat_service, commit_service, db):
+    ids = await commit_turns(chat_service, commit_service, "source", USER, db, 2)
+    fork = await commit_service.fork_commit(ids[1], USER, db)
+    fork_ids = await commit_turns(chat_service, commit_service, fork.chatId, USER, db, 2)
+
+    report = await retention_service.run_once(db)
+
+    assert report["chats"] == 2
+    assert await db.commits.count_documents({"chatId": fork.chatId}) == 1
+    latest = await db.commits.find_one({"commitId": fork_ids[1]})
+    assert user_messages(await commit_service.resolve_commit_messages(latest, db)) == [
+        "message 0", "message 1", "message 0", "message 1"
+    ]
+
+async def test_retention_only_revisits_chats_with_new_commits(chat_service, commit_service, db, monkeypatch):
+    await commit_turns(chat_service, commit_service, "busy", USER, db, 2)
+    await commit_turns(chat_service, commit_service, "idle", USER, db, 2)
+
+    first = await retention_service.run_once(db)
+    assert (first["fullPass"], first["chats"]) == (True, 2)
+
+    # Commits from before the last pass (beyond the clock-skew margin)
+    await db.commits.update_many({}, {"$set": {"timestamp": datetime.utcnow() - timedelta(hours=1)}})
+    await db.maintenance.update_one({"_id": "retention"}, {"$set": {"since": datetime.utcnow() - timedelta(minutes=30)}})
+    await commit_turns(chat_service, commit_service, "busy", USER, db, 1)
+
+    second = await retention_service.run_once(db)
+    assert (second["fullPass"], second["chats"], second["commitsDeleted"]) == (False, 1, 1)
+
+    # New settings apply to every chat
+    monkeypatch.setattr(settings, "retention_keep_last", 2)
+    third = await retention_service.run_once(db)
+    assert (third["fullPass"], third["chats"]) == (True, 2)
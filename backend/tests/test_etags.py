@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CHAT = "chat-etag"
+
+async def send_turn(client, message="hello"):
+    response = await client.post("/v1/chat", json={"chatId": CHAT, "userMessage": message})
+    assert response.status_code == 200
+    # Mongo keeps milliseconds: keep the chat list revisions of consecutive writes apart
+    await asyncio.sleep(0.002)
+
+async def assert_revalidates(client, url):
+    """Return the ETag after checking a 200 carries a weak one and a matching If-None-Match gets 304"""
+    first = await client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    cached = await client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+    # Weak comparison: the same tag without W/ still matches
+    assert (await client.get(url, headers={"If-None-Match": etag.removeprefix("W/")})).status_code == 304
+    return etag
+
+async def test_messages_etag_changes_after_a_turn(client):
+    await send_turn(client)
+    url = f"/v1/chat/{CHAT}/messages"
+    etag = await assert_revalidates(client, url)
+
+    await send_turn(client, "again")
+
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.json()["messages"]) == 4
+
+async def test_chat_list_etag_changes_after_a_turn_or_new_chat(client):
+    await send_turn(client)
+    etag = await assert_revalidates(client, "/v1/chat/list")
+
+    await send_turn(client, "again")
+    after_turn = await client.get("/v1/chat/list", headers={"If-None-Match": etag})
+    assert after_turn.status_code == 200
+    assert after_turn.headers["ETag"] != etag
+
+    created = await client.post("/v1/chat/new")
+    assert created.status_code == 200
+    after_new = await client.get("/v1/chat/list", headers={"If-None-Match": after_turn.headers["ETag"]})
+    assert after_new.status_code == 200
+    assert after_new.headers["ETag"] != after_turn.headers["ETag"]
+    assert created.json()["chatId"] in [c["chatId"] for c in after_new.json()["chats"]]
+
+async def test_history_etag_changes_after_a_commit(client):
+    await send_turn(client)
+    url = f"/v1/commits/{CHAT}"
+    etag = await assert_revalidates(client, url)
+    assert (await client.get(url)).json()["totalCount"] == 0
+
+    committed = await client.post("/v1/commits/commit", json={"chatId": CHAT, "name": "first"})
+    assert committed.status_code == 200
+
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["totalCount"] == 1
+    # A turn alone does not change the history
+    await send_turn(client, "again")
+    assert (await client.get(url, headers={"If-None-Match": response.headers["ETag"]})).status_code == 304
+
+async def test_missing_chat_has_no_etag(client):
+    response = await client.get("/v1/chat/missing/messages")
+    assert "ETag" not in response.headers
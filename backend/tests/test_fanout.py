@@ -0,0 +1,32 @@
+import orjson
+import pytest
+
+from app.core.config import settings
+from tests.conftest import USER_ID
+from tests.helpers import commit_turns
+
+pytestmark = pytest.mark.anyio
+
+async def test_fanout_takes_a_rate_limit_token_per_generation(client, chat_service, commit_service, db, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_burst", 5)
+    ids = await commit_turns(chat_service, commit_service, "chat", USER_ID, db, 3)
+    body = {"userMessage": "which is better?", "commitIds": ids, "models": ["large"]}
+
+    first = await client.post("/v1/commits/fanout", json=body)
+    assert first.status_code == 200
+    results = [orjson.loads(line) for line in first.content.splitlines()]
+    assert sorted(r["commitId"] for r in results) == sorted(ids)
+
+    # Three generations need three tokens; only two are left
+    second = await client.post("/v1/commits/fanout", json=body)
+    assert second.status_code == 429
+    assert int(second.headers["Retry-After"]) >= 1
+
+async def test_fanout_larger_than_burst_is_rejected(client, chat_service, commit_service, db, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_burst", 2)
+    ids = await commit_turns(chat_service, commit_service, "chat", USER_ID, db, 3)
+
+    response = await client.post("/v1/commits/fanout", json={"userMessage": "hi", "commitIds": ids, "models": ["large"]})
+
+    assert response.status_code == 400
+    assert "limit of 2" in response.json()["detail"]
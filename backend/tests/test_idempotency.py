@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.core.idempotency import IdempotencyConflict, IdempotencyStore, abandoned_check
+from app.core.shared_state import FileBackend
+from app.services.llm import OllamaClient
+from app.services.services import ChatService, GenerationCancelled
+from benchmarks.fake_ollama import FakeOllama
+
+pytestmark = pytest.mark.anyio
+
+async def test_chat_retry_replays_turn(client, ollama, db):
+    server, _ = ollama
+    body = {"chatId": "chat-1", "userMessage": "hello"}
+    headers = {"Idempotency-Key": "key-1"}
+
+    first = await client.post("/v1/chat", json=body, headers=headers)
+    retry = await client.post("/v1/chat", json=body, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert server.completed == 1
+    chat = await db.chats.find_one({"chatId": "chat-1"})
+    assert len(chat["messages"]) == 2
+
+async def test_key_reused_with_different_body_conflicts(client):
+    headers = {"Idempotency-Key": "key-2"}
+    await client.post("/v1/chat", json={"chatId": "chat-2", "userMessage": "hello"}, headers=headers)
+    response = await client.post("/v1/chat", json={"chatId": "chat-2", "userMessage": "other"}, headers=headers)
+    assert response.status_code == 409
+
+async def test_shared_backend_replays_across_stores(tmp_path):
+    backend = FileBackend(str(tmp_path / "state.sqlite3"))
+    # Two stores on one backend stand in for two workers
+    first, second = IdempotencyStore(10, 60, backend), IdempotencyStore(10, 60, backend)
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"value": len(calls)}
+
+    results = await asyncio.gather(first.run("k", "fp", work), second.run("k", "fp", work))
+    assert results == [{"value": 1}, {"value": 1}]
+    assert len(calls) == 1
+    with pytest.raises(IdempotencyConflict):
+        await second.run("k", "other", work)
+
+@pytest.fixture
+async def slow_chat_service(monkeypatch):
+    monkeypatch.setattr(settings, "disconnect_poll_seconds", 0.02)
+    monkeypatch.setattr(settings, "idempotency_retry_grace_seconds", 0.1)
+    server = FakeOllama(tokens=200, token_interval=0.01)
+    await server.start()
+    service = ChatService()
+    service.llm = OllamaClient(server.base_url, 10)
+    yield service, server
+    await service.llm.close()
+    await server.stop()
+
+async def gone():
+    return True
+
+async def test_abandoned_keyed_turn_is_cancelled(slow_chat_service, db):
+    service, server = slow_chat_service
+    store = IdempotencyStore(10, 60)
+
+    async def run():
+        return await service.process_message_cancellable(
+            "chat", "hello", "user-1", db, is_disconnected=abandoned_check(gone, store, "k")
+        )
+
+    with pytest.raises(GenerationCancelled):
+        await asyncio.wait_for(store.run("k", "fp", run), timeout=1.5)
+    await asyncio.sleep(0.05)
+    assert server.aborted == 1
+
+async def test_keyed_turn_survives_for_attached_retry(slow_chat_service, db, monkeypatch):
+    service, server = slow_chat_service
+    server.tokens = 30
+    store = IdempotencyStore(10, 60)
+
+    async def run():
+        return await service.process_message_cancellable(
+            "chat", "hello", "user-1", db, is_disconnected=abandoned_check(gone, store, "k")
+        )
+
+    original = asyncio.create_task(store.run("k", "fp", run))
+    await asyncio.sleep(0.05)
+    retry = await store.run("k", "fp", run)
+
+    assert retry.assistantMessage.startswith("tok0")
+    assert (await original).assistantMessage == retry.assistantMessage
+    assert server.completed == 1 and server.aborted == 0
@@ -0,0 +1,65 @@
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.load_shedding import CRITICAL, LLM, READ, WRITE, LoadMonitor, LoadSheddingMiddleware, classify
+from app.services.llm import ConcurrencyGate
+
+pytestmark = pytest.mark.anyio
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+@pytest.fixture
+def monitor():
+    return LoadMonitor(ConcurrencyGate(1))
+
+@pytest.fixture
+async def shed_client(monitor):
+    transport = httpx.ASGITransport(app=LoadSheddingMiddleware(ok_app, monitor))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+def test_classify():
+    assert classify("POST", "/v1/chat/abc/cancel") == CRITICAL
+    assert classify("POST", "/v1/chat/abc/cancel/") == CRITICAL
+    assert classify("GET", "/health") == CRITICAL
+    assert classify("POST", "/v1/auth/login") == CRITICAL
+    assert classify("POST", "/v1/chat") == LLM
+    assert classify("POST", "/v1/commits/fanout") == LLM
+    assert classify("GET", "/v1/chat/abc/messages") == READ
+    assert classify("POST", "/v1/commits") == WRITE
+
+async def test_lagging_loop_sheds_writes_but_not_cancels(shed_client, monitor):
+    monitor.lag_ms = settings.loop_lag_shed_ms
+
+    response = await shed_client.post("/v1/chat", json={})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert (await shed_client.post("/v1/commits", json={})).status_code == 503
+    # Cancels, health checks and reads still get through
+    assert (await shed_client.post("/v1/chat/abc/cancel")).status_code == 200
+    assert (await shed_client.get("/health")).status_code == 200
+    assert (await shed_client.get("/v1/chat/list")).status_code == 200
+    assert monitor.shed_count == 2
+
+    monitor.lag_ms = settings.loop_lag_critical_ms
+    assert (await shed_client.get("/v1/chat/list")).status_code == 503
+    assert (await shed_client.post("/v1/chat/abc/cancel")).status_code == 200
+    assert monitor.snapshot()["status"] == "overloaded"
+
+async def test_full_model_queue_rejects_generations(shed_client, monitor, monkeypatch):
+    monkeypatch.setattr(settings, "llm_max_queue", 1)
+    monitor.gate.waiting = 1
+
+    response = await shed_client.post("/v1/chat", json={})
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Model queue is full"}
+    assert "retry-after" in response.headers
+    assert (await shed_client.post("/v1/commits", json={})).status_code == 200
+
+async def test_disabled_never_sheds(shed_client, monitor, monkeypatch):
+    monkeypatch.setattr(settings, "load_shedding_enabled", False)
+    monitor.lag_ms = settings.loop_lag_critical_ms
+    assert (await shed_client.post("/v1/chat", json={})).status_code == 200
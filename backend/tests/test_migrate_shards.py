@@ -0,0 +1,54 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.db import database
+from app.db.database import deployment_for_user
+from scripts.migrate_shards import migrate
+from tests.helpers import commit_turns, user_messages
+
+pytestmark = pytest.mark.anyio
+
+USERS = [f"user-{i}" for i in range(12)]
+
+@pytest.fixture
+def shards(monkeypatch):
+    shards = {name: AsyncMongoMockClient()[f"shard_{name}"] for name in ("a", "b", "c")}
+    monkeypatch.setattr(database.db, "shards", shards)
+    return shards
+
+async def test_moves_primary_data_to_deployments(chat_service, commit_service, db, shards):
+    # Written before MONGODB_SHARD_URLS was set
+    numbers = {}
+    for user_id in USERS:
+        await commit_turns(chat_service, commit_service, f"chat-{user_id}", user_id, db, 1)
+        await db.usage.insert_one({"_id": f"{user_id}:2026-01-01", "userId": user_id, "turns": 1})
+        numbers[user_id] = await chat_service.next_chat_number(user_id, db)
+
+    report = await migrate({"(primary)": db})
+
+    assert report["users"] == len(USERS)
+    for name in ("chats", "commits", "usage", "counters"):
+        assert await db[name].count_documents({}) == 0
+    for user_id in USERS:
+        home = shards[deployment_for_user(user_id)]
+        assert user_messages(await chat_service.get_chat_messages(f"chat-{user_id}", user_id, home)) == ["message 0"]
+        assert await home.commits.count_documents({"userId": user_id}) == 1
+        # Today's turn plus the older day
+        assert await home.usage.count_documents({"userId": user_id}) == 2
+        assert await chat_service.next_chat_number(user_id, home) == numbers[user_id] + 1
+
+async def test_adding_a_deployment_moves_only_its_users(db, shards, monkeypatch):
+    for user_id in USERS:
+        await shards[deployment_for_user(user_id)].chats.insert_one({"chatId": "c", "userId": user_id, "messages": []})
+    before = {u: deployment_for_user(u) for u in USERS}
+    grown = {**shards, "d": AsyncMongoMockClient()["shard_d"]}
+    monkeypatch.setattr(database.db, "shards", grown)
+
+    report = await migrate(shards)
+
+    moved = [u for u in USERS if deployment_for_user(u) != before[u]]
+    assert all(deployment_for_user(u) == "d" for u in moved)
+    assert report["users"] == len(moved)
+    for user_id in USERS:
+        assert await grown[deployment_for_user(user_id)].chats.count_documents({"userId": user_id}) == 1
+    assert await migrate(grown) == {"users": 0, "documents": 0}
@@ -0,0 +1,63 @@
+import pytest
+
+from app.core.config import settings
+from app.services.routing import FAST, LARGE, model_router
+from app.services.warmup import LOADING, WARM, model_warmer
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def fast_model(monkeypatch):
+    monkeypatch.setattr(settings, "ollama_fast_model", "fast-model")
+    monkeypatch.setattr(model_warmer, "models", {})
+    return "fast-model"
+
+async def chat(client, message, **extra):
+    return await client.post("/v1/chat", json={"chatId": "chat", "userMessage": message, **extra})
+
+async def test_routing_is_off_without_a_fast_model(client, monkeypatch):
+    monkeypatch.setattr(settings, "ollama_fast_model", "")
+
+    response = await chat(client, "hi")
+    assert response.status_code == 200
+    assert response.json()["route"] == LARGE
+    assert response.json()["model"] == settings.ollama_model
+
+    forced = await chat(client, "hi", route=FAST)
+    assert forced.status_code == 400
+    assert "Unknown model route 'fast'" in forced.json()["detail"]
+
+async def test_short_turns_go_to_the_fast_model(client, fast_model):
+    response = await chat(client, "hi there")
+    assert response.status_code == 200
+    assert (response.json()["route"], response.json()["model"]) == (FAST, fast_model)
+
+    heavy = await chat(client, "please refactor this module")
+    assert (heavy.json()["route"], heavy.json()["model"]) == (LARGE, settings.ollama_model)
+
+    forced = await chat(client, "hi", route=LARGE)
+    assert forced.json()["route"] == LARGE
+
+def test_heavy_turns(fast_model):
+    assert not model_router.is_heavy("what time is it?", [])
+    assert model_router.is_heavy("x" * (settings.routing_fast_max_chars + 1), [])
+    assert model_router.is_heavy("why does this fail?\nTraceback (most recent call last):", [])
+    assert model_router.is_heavy("can you debug it", [])
+    long_history = [{"role": "user", "content": "x" * (settings.routing_fast_max_history_chars + 1)}]
+    assert model_router.route("thanks!", long_history).route == LARGE
+
+def test_loading_model_falls_back_to_a_warm_one(fast_model, monkeypatch):
+    monkeypatch.setattr(model_warmer, "models", {
+        fast_model: {"state": LOADING, "lastUsed": 0, "loadSeconds": None, "error": None},
+        settings.ollama_model: {"state": WARM, "lastUsed": 0, "loadSeconds": None, "error": None},
+    })
+
+    assert model_router.route("hi", []).route == LARGE
+    # An explicit route is honoured even while its model loads
+    assert model_router.route("hi", [], override=FAST).route == FAST
+
+def test_explicit_model_names(fast_model):
+    assert model_router.for_model(fast_model).route == FAST
+    assert model_router.for_model(LARGE).model == settings.ollama_model
+    with pytest.raises(ValueError):
+        model_router.for_model("nope")
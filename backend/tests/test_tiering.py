@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.services.maintenance import retention_service
+from app.services.tiering import tiering_service
+from tests.helpers import commit_turns, user_messages
+
+pytestmark = pytest.mark.anyio
+
+USER = "user-1"
+
+@pytest.fixture(autouse=True)
+def no_pause(monkeypatch):
+    monkeypatch.setattr(settings, "tiering_batch_pause_ms", 0)
+
+async def age_everything(db):
+    old = datetime.utcnow() - timedelta(days=365)
+    await db.chats.update_many({}, {"$set": {"updated_at": old}})
+    commits = await db.commits.find().sort("timestamp", 1).to_list(None)
+    for i, commit in enumerate(commits):
+        await db.commits.update_one({"_id": commit["_id"]}, {"$set": {"timestamp": old + timedelta(minutes=i)}})
+
+async def test_round_trip(chat_service, commit_service, db):
+    ids = await commit_turns(chat_service, commit_service, "chat", USER, db, 3)
+    fork = await commit_service.fork_commit(ids[1], USER, db)
+    before = await chat_service.get_chat_messages("chat", USER, db)
+    fork_before = await chat_service.get_chat_messages(fork.chatId, USER, db)
+    await age_everything(db)
+
+    report = await tiering_service.run_once(db)
+
+    assert report["chatsDemoted"] == 1 and report["commitsDemoted"] == 3
+    assert (await db.chats.find_one({"chatId": "chat"}))["messages"] == []
+    # Forks read through their cold base without moving it back
+    assert user_messages(await chat_service.get_chat_messages(fork.chatId, USER, db)) == user_messages(fork_before)
+    assert (await db.commits.find_one({"commitId": ids[1]}))["tier"] == "cold"
+
+    # Opening the chat rehydrates it
+    assert user_messages(await chat_service.get_chat_messages("chat", USER, db)) == user_messages(before)
+    chat = await db.chats.find_one({"chatId": "chat"})
+    assert "tier" not in chat and user_messages(chat["messages"]) == user_messages(before)
+
+    # Fetching a cold commit rehydrates it and drops every cold copy it replaces
+    restored = await commit_service.fetch_commit(ids[0], USER, db)
+    assert user_messages(restored.restoredMessages) == ["message 0"]
+    assert await db.cold_storage.count_documents({"_id": {"$regex": "^chat:"}}) == 0
+    assert await db.cold_storage.count_documents({}) == await db.commits.count_documents({"tier": "cold"})
+
+async def test_turn_on_cold_chat(chat_service, commit_service, db):
+    await commit_turns(chat_service, commit_service, "chat", USER, db, 1)
+    await age_everything(db)
+    await tiering_service.run_once(db)
+
+    await chat_service.process_message("chat", "back again", USER, db)
+
+    assert user_messages(await chat_service.get_chat_messages("chat", USER, db)) == ["message 0", "back again"]
+    assert await db.cold_storage.count_documents({"_id": {"$regex": "^chat:"}}) == 0
+
+async def test_retention_on_cold_commits(chat_service, commit_service, db, monkeypatch):
+    monkeypatch.setattr(settings, "retention_policies", "keep_last")
+    monkeypatch.setattr(settings, "retention_keep_last", 2)
+    monkeypatch.setattr(settings, "retention_batch_pause_ms", 0)
+    ids = await commit_turns(chat_service, commit_service, "chat", USER, db, 4)
+    await age_everything(db)
+    await tiering_service.run_once(db)
+    assert await db.commits.count_documents({"tier": "cold"}) == 4
+
+    report = await retention_service.run_once(db)
+
+    # The two oldest go (with their cold copies); the survivor rewritten as a delta comes back hot
+    assert report["commitsDeleted"] == 2 and report["commitsCompacted"] == 1
+    assert set(await db.commits.distinct("commitId")) == {ids[2], ids[3]}
+    assert set(await db.cold_storage.distinct("_id", {"kind": "commit"})) == {f"commit:{USER}:{ids[2]}"}
+    latest = await db.commits.find_one({"commitId": ids[3]})
+    assert latest["baseCommitId"] == ids[2] and "tier" not in latest
+    assert user_messages(await commit_service.resolve_commit_messages(latest, db)) == [f"message {i}" for i in range(4)]
+
+    # A second pass has nothing left to do
+    report = await retention_service.run_once(db)
+    assert report["commitsDeleted"] == 0 and report["commitsCompacted"] == 0
+
+async def test_demotion_skips_commit_rewritten_meanwhile(chat_service, commit_service, db):
+    ids = await commit_turns(chat_service, commit_service, "chat", USER, db, 2)
+    stale = await db.commits.find_one({"commitId": ids[1]})
+    # Retention turns it into a delta after tiering read it
+    await db.commits.update_one({"commitId": ids[1]}, {"$set": {"baseCommitId": ids[0], "messages": stale["messages"][2:]}})
+
+    assert await tiering_service.demote_commit(stale, db) == 0
+    assert "tier" not in await db.commits.find_one({"commitId": ids[1]})
+    assert await db.cold_storage.count_documents({}) == 0
+
+async def test_history_counts_legacy_commits_after_demotion(chat_service, commit_service, db):
+    ids = await commit_turns(chat_service, commit_service, "chat", USER, db, 2)
+    # Commits written before messageCount existed
+    await db.commits.update_many({}, {"$unset": {"messageCount": ""}})
+    await age_everything(db)
+    await tiering_service.run_once(db)
+
+    history = await commit_service.get_commit_history("chat", USER, db)
+
+    assert {c.commitId: c.messageCount for c in history.commits} == {ids[0]: 2, ids[1]: 4}
+    # Demoted before the count was kept: history reads the cold copy
+    await db.commits.update_one({"commitId": ids[0]}, {"$unset": {"messageCount": ""}})
+    history = await commit_service.get_commit_history("chat", USER, db)
+    assert {c.commitId: c.messageCount for c in history.commits} == {ids[0]: 2, ids[1]: 4}
@@ -0,0 +1,71 @@
+import pytest
+
+from app.core.config import settings
+from app.core.shared_state import FileBackend
+from app.services import usage
+from app.services.usage import QuotaExceeded, UsageService
+
+pytestmark = pytest.mark.anyio
+
+USER = "user-1"
+
+async def test_single_worker_bucket(db, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_burst", 3)
+    service = UsageService()
+    for _ in range(3):
+        await service.check(USER, db)
+    with pytest.raises(QuotaExceeded) as exc:
+        await service.check(USER, db)
+    assert 0 < exc.value.retry_after <= 60 / settings.rate_limit_turns_per_minute
+
+async def test_limit_is_shared_across_workers(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "shared_state_backend", "file")
+    monkeypatch.setattr(settings, "rate_limit_burst", 4)
+    monkeypatch.setattr(usage, "shared_state", FileBackend(str(tmp_path / "state.sqlite3")))
+    # Windows last 60 * 4 / 20 = 12s; pin the clock inside one
+    monkeypatch.setattr(usage.time, "time", lambda: 1000.0)
+    # Two services stand in for two workers
+    workers = [UsageService(), UsageService()]
+
+    admitted = 0
+    for i in range(8):
+        try:
+            await workers[i % 2].check(USER, db)
+            admitted += 1
+        except QuotaExceeded:
+            pass
+    assert admitted == 4
+    with pytest.raises(QuotaExceeded) as exc:
+        await workers[0].check(USER, db)
+    assert exc.value.retry_after == pytest.approx(8.0)
+    # Other users have their own windows
+    await workers[1].check("someone-else", db, turns=4)
+
+async def test_shared_counter_only_sees_admitted_turns(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "shared_state_backend", "file")
+    monkeypatch.setattr(settings, "rate_limit_burst", 2)
+    backend = FileBackend(str(tmp_path / "state.sqlite3"))
+    monkeypatch.setattr(usage, "shared_state", backend)
+    monkeypatch.setattr(usage.time, "time", lambda: 1000.0)
+    calls = []
+    incr = backend.incr
+
+    async def counting_incr(key, amount, ttl):
+        calls.append(amount)
+        return await incr(key, amount, ttl)
+
+    monkeypatch.setattr(backend, "incr", counting_incr)
+    worker, other = UsageService(), UsageService()
+
+    await other.check(USER, db, turns=2)
+    # This worker's own bucket has room, the shared window does not
+    for _ in range(3):
+        with pytest.raises(QuotaExceeded):
+            await worker.check(USER, db)
+    # One admitted batch, then one rejected attempt and its rollback; later attempts stay local
+    assert calls == [2, 1, -1]
+    # Over the local bucket: rejected without touching the shared counter
+    for _ in range(2):
+        with pytest.raises(QuotaExceeded):
+            await other.check(USER, db)
+    assert calls == [2, 1, -1]
@@ -52,10 +52,10 @@ class ApiService {
   }
 
   // Chat API
-  async sendMessage(chatId: string, userMessage: string): Promise<ApiResponse<any>> {
+  async sendMessage(chatId: string, userMessage: string, idempotencyKey: string = crypto.randomUUID()): Promise<ApiResponse<any>> {
     const response = await fetch(`${API_BASE_URL}/chat`, {
       method: 'POST',
-      headers: this.getAuthHeaders(),
+      headers: { ...this.getAuthHeaders(), 'Idempotency-Key': idempotencyKey },
       body: JSON.stringify({
         chatId,
         userMessage,
@@ -66,10 +66,10 @@ class ApiService {
   }
 
   // Commit API
-  async createCommit(chatId: string, name: string): Promise<ApiResponse<any>> {
+  async createCommit(chatId: string, name: string, idempotencyKey: string = crypto.randomUUID()): Promise<ApiResponse<any>> {
     const response = await fetch(`${API_BASE_URL}/commits/commit`, {
       method: 'POST',
-      headers: this.getAuthHeaders(),
+      headers: { ...this.getAuthHeaders(), 'Idempotency-Key': idempotencyKey },
       body: JSON.stringify({
         chatId,
         name,